@@ -28,6 +28,7 @@ setup(
     packages=find_packages(exclude=['contrib', 'test*', 'docs']),
     include_package_data=True,
     install_requires=requirements,
+    extras_require={'numpy': ['numpy']},
     license='GPLv3',
     zip_safe=False,
     keywords='vld var log dieta diet calories',
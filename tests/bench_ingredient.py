@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Run with: python -m tests.bench_ingredient
+from __future__ import absolute_import, unicode_literals, division, \
+    print_function
+
+import logging
+import timeit
+
+from unidecode import unidecode
+
+from vld.ingredient import IngredientMap, normalize_name_stats
+from vld.objects import Ingredient, NutritionalValue
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+_NAMES = ['leche', 'Leche ', 'huevo', 'Pan Integral', 'limón', 'café']
+_NUMBER = 20000
+
+
+def _ingredient_map(size):
+    names = ['ingredient {}'.format(i) for i in range(size)] + _NAMES
+    return IngredientMap(
+        Ingredient(name=n,
+                   sample_size=100,
+                   sample_unit='g',
+                   sample_value=NutritionalValue()) for n in names)
+
+
+def _per_lookup_us(func):
+    seconds = min(timeit.repeat(func, number=_NUMBER, repeat=3))
+    return seconds / (_NUMBER * len(_NAMES)) * 1e6
+
+
+def main():
+    ingredients = _ingredient_map(10000)
+    table = {unidecode(i.name.strip()).lower(): i for i in ingredients}
+
+    def unmemoized():
+        for name in _NAMES:
+            _ = table[unidecode(name.strip()).lower()]
+
+    def memoized():
+        for name in _NAMES:
+            _ = ingredients[name]
+
+    unmemoized_us = _per_lookup_us(unmemoized)
+    memoized_us = _per_lookup_us(memoized)
+    print('unidecode per lookup: {:8.3f} us/lookup'.format(unmemoized_us))
+    print('IngredientMap:        {:8.3f} us/lookup ({:.1f}x)'.format(
+        memoized_us, unmemoized_us / memoized_us))
+    stats = normalize_name_stats()
+    print('exact hits: {}, normalization hits: {}, misses: {}'.format(
+        ingredients.exact_hits, stats.hits, stats.misses))
+
+
+if __name__ == '__main__':
+    main()
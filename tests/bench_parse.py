@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Run with: python -m tests.bench_parse
+from __future__ import absolute_import, unicode_literals, division, \
+    print_function
+
+import logging
+import timeit
+
+from vld import parse
+from vld.parse import parse_amount, parse_log_line
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+_AMOUNTS = ['200', '0.5', '3/2', '1 / 4']
+# eval() cannot read mixed numbers like '1 1/2', so the lines avoid them
+_LINES = ['leche, 200 ml', '2 huevo', '1/2 taza de avena',
+          'pan, 3/2 rebanada']
+_NUMBER = 20000
+
+
+def _eval_amount(amount):
+    return float(eval(amount))  # pylint: disable=eval-used
+
+
+def _eval_amounts():
+    for amount in _AMOUNTS:
+        _eval_amount(amount)
+
+
+def _parse_amounts():
+    for amount in _AMOUNTS:
+        parse_amount(amount)
+
+
+def _parse_lines():
+    for line in _LINES:
+        parse_log_line(line, empty_unit='unidad')
+
+
+def _eval_parse_lines():
+    # The same lines, with the amounts evaluated as parse_log_line did
+    # before parse_amount
+    parse_amount_ = parse.parse_amount
+    parse.parse_amount = _eval_amount
+    try:
+        _parse_lines()
+    finally:
+        parse.parse_amount = parse_amount_
+
+
+def _per_item_us(func, items):
+    seconds = min(timeit.repeat(func, number=_NUMBER, repeat=3))
+    return seconds / (_NUMBER * len(items)) * 1e6
+
+
+def main():
+    eval_us = _per_item_us(_eval_amounts, _AMOUNTS)
+    parse_us = _per_item_us(_parse_amounts, _AMOUNTS)
+    print('eval() amount:       {:8.3f} us/amount'.format(eval_us))
+    print('parse_amount:        {:8.3f} us/amount ({:.1f}x)'.format(
+        parse_us, eval_us / parse_us))
+    eval_line_us = _per_item_us(_eval_parse_lines, _LINES)
+    line_us = _per_item_us(_parse_lines, _LINES)
+    print('eval() line:         {:8.3f} us/line'.format(eval_line_us))
+    print('parse_log_line:      {:8.3f} us/line ({:.1f}x)'.format(
+        line_us, eval_line_us / line_us))
+
+
+if __name__ == '__main__':
+    main()
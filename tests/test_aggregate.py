@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+import unittest
+
+from pignacio_scripts.testing import TestCase
+
+from vld import aggregate
+from vld.aggregate import Aggregation, iter_leaves
+from vld.ingredient import IngredientMap
+from vld.objects import Ingredient, LogData, NutritionalValue
+from vld.parse import parse_log_data, parse_log_lines
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def _log_data(name):
+    return LogData(name=name,
+                   nutritional_value=NutritionalValue.UNKNOWN,
+                   incomplete=True)
+
+
+class IterLeavesTests(TestCase):
+    def test_order(self):
+        leaves = [_log_data(str(i)) for i in range(4)]
+        log = LogData.from_parts('all', [
+            LogData.from_parts('a', [leaves[0],
+                                     LogData.from_parts('b', leaves[1:3])]),
+            leaves[3],
+        ])  # yapf: disable
+        self.assertEqual(list(iter_leaves(log)), leaves)
+
+    def test_leaf(self):
+        leaf = _log_data('leaf')
+        self.assertEqual(list(iter_leaves(leaf)), [leaf])
+
+
+class AggregationTests(TestCase):
+    def setUp(self):
+        self.leche = Ingredient(name='leche',
+                                sample_size=100,
+                                sample_unit='ml',
+                                sample_value=NutritionalValue(calories=50),
+                                conversions={'taza': {'ml': 250}},
+                                categories=['Lacteos'])
+        self.pan = Ingredient(name='pan',
+                              sample_size=1,
+                              sample_unit='rebanada',
+                              sample_value=NutritionalValue(calories=80))
+        self.ingredients = IngredientMap([self.leche, self.pan])
+        self.unknown = _log_data('algo raro')
+        self.aggregation = Aggregation(self.ingredients, [
+            self._leaf("leche, 200 ml"),
+            self._leaf("leche, 1 taza"),
+            self.unknown,
+            self._leaf("leche, 100 ml"),
+            self._leaf("pan, 2 rebanada"),
+        ])  # yapf: disable
+
+    def _leaf(self, line):
+        return parse_log_data(line, self.ingredients)
+
+    def test_amounts(self):
+        self.assertEqual(
+            {k: dict(v) for k, v in self.aggregation.amounts.items()},
+            {'leche': {'ml': 300, 'taza': 1}, 'pan': {'rebanada': 2}})
+        self.assertEqual(self.aggregation.unmatched, [self.unknown])
+
+    def test_rows(self):
+        rows = {r.unit: r for r in self.aggregation.rows('leche')}
+        self.assertEqual(rows['ml'].amount, 300)
+        self.assertEqual(rows['ml'].nutritional_value.calories, 150)
+        self.assertEqual(rows['taza'].nutritional_value.calories, 125)
+        self.assertEqual(rows['taza'].ingredient, self.leche)
+
+    def test_add_updates_rows(self):
+        self.aggregation.rows('pan')
+        self.aggregation.add(self._leaf("pan, 1 rebanada"))
+        row, = self.aggregation.rows('pan')
+        self.assertEqual(row.nutritional_value.calories, 240)
+
+    def _calories(self, groups):
+        return {k: sum(r.nutritional_value.calories for r in rows)
+                for k, rows in groups.items()}
+
+    def test_group_by_ingredient(self):
+        self.assertEqual(self._calories(self.aggregation.group('ingredient')),
+                         {('leche', ): 275, ('pan', ): 160})
+
+    def test_group_by_category(self):
+        self.assertEqual(self._calories(self.aggregation.group('category')),
+                         {('lacteos', ): 275, ('unknown', ): 160})
+
+    def test_group_by_several_keys(self):
+        self.assertEqual(
+            self._calories(self.aggregation.group('category', 'unit')),
+            {('lacteos', 'ml'): 150,
+             ('lacteos', 'taza'): 125,
+             ('unknown', 'rebanada'): 160})
+
+
+class _AddColumnsTests(object):
+    def setUp(self):
+        super(_AddColumnsTests, self).setUp()
+        leche = Ingredient(name='leche',
+                           sample_size=100,
+                           sample_unit='ml',
+                           sample_value=NutritionalValue(calories=50),
+                           conversions={'taza': {'ml': 250}})
+        self.ingredients = IngredientMap([leche])
+        self.lines = ["leche, 200 ml", "leche, 1 taza", "algo raro",
+                      "leche, 0.1 ml", "otra cosa # k: 20", "leche, 0.2 ml"]
+
+    def _aggregation(self, lines):
+        aggregation = Aggregation(self.ingredients)
+        aggregation.add_columns(parse_log_lines(lines, self.ingredients))
+        return aggregation
+
+    def test_same_as_leaves(self):
+        leaves = Aggregation(self.ingredients, [
+            parse_log_data(line, self.ingredients)._replace(is_leaf=True)
+            if line.startswith('leche') else
+            LogData(name=line, nutritional_value=NutritionalValue.UNKNOWN,
+                    incomplete=True, is_leaf=True)
+            for line in self.lines[:4]])
+        columns = self._aggregation(self.lines[:4])
+        self.assertEqual(columns.amounts, leaves.amounts)
+        self.assertEqual(list(columns.amounts['leche']), ['ml', 'taza'])
+        self.assertEqual(columns.unmatched, leaves.unmatched)
+        self.assertEqual(columns.group('ingredient'),
+                         leaves.group('ingredient'))
+
+    def test_amounts_are_added_in_order(self):
+        aggregation = self._aggregation(self.lines)
+        self.assertEqual(aggregation.amounts['leche']['ml'],
+                         0 + 200 + 0.1 + 0.2)
+
+    def test_comment_values_are_kept(self):
+        _unknown, comment = self._aggregation(self.lines).unmatched
+        self.assertEqual(comment.nutritional_value.calories, 20)
+        self.assertFalse(comment.incomplete)
+
+    def test_updates_rows(self):
+        aggregation = self._aggregation(self.lines[:1])
+        self.assertEqual(aggregation.rows('leche')[0].amount, 200)
+        aggregation.add_columns(parse_log_lines(self.lines[:1],
+                                                self.ingredients))
+        self.assertEqual(aggregation.rows('leche')[0].amount, 400)
+
+    def test_no_lines(self):
+        aggregation = self._aggregation([])
+        self.assertEqual(aggregation.amounts, {})
+        self.assertEqual(aggregation.unmatched, [])
+
+
+class PythonAddColumnsTests(_AddColumnsTests, TestCase):
+    def setUp(self):
+        super(PythonAddColumnsTests, self).setUp()
+        self.patch_object(aggregate, 'numpy', None)
+
+
+@unittest.skipIf(aggregate.numpy is None, 'numpy is not installed')
+class NumpyAddColumnsTests(_AddColumnsTests, TestCase):
+    pass
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+
+from pignacio_scripts.testing import TestCase
+
+from vld import conversions
+from vld.conversions import (get_conversion_table, get_conversion_lookup,
+                             CantConvert, Conversions)
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+_DEFAULTS = {
+    'kg': {'g': 1000},
+    'taza': {'ml': 250},
+}  # yapf: disable
+
+
+class GetConversionTableTests(TestCase):
+    def test_default_conversions(self):
+        table = get_conversion_table({}, _DEFAULTS)
+        self.assertAlmostEqual(table['kg']['g'], 1000)
+        self.assertAlmostEqual(table['g']['kg'], 0.001)
+
+    def test_ingredient_conversions(self):
+        table = get_conversion_table({'u': {'g': 50}}, _DEFAULTS)
+        self.assertAlmostEqual(table['u']['kg'], 0.05)
+        self.assertAlmostEqual(table['taza']['ml'], 250)
+
+    def test_ingredient_conversions_take_precedence(self):
+        table = get_conversion_table({'taza': {'ml': 200}}, _DEFAULTS)
+        self.assertAlmostEqual(table['taza']['ml'], 200)
+
+    def test_unrelated_units_cannot_convert(self):
+        table = get_conversion_table({'u': {'g': 50}}, _DEFAULTS)
+        self.assertNotIn('ml', table['u'])
+
+
+class GetConversionLookupTests(TestCase):
+    def test_factor(self):
+        lookup = get_conversion_lookup({'u': {'g': 50}}, _DEFAULTS)
+        self.assertAlmostEqual(lookup.factor('u', 'kg'), 0.05)
+        self.assertAlmostEqual(lookup.factor('kg', 'u'), 20)
+
+    def test_matches_table(self):
+        conversions = {'u': {'g': 50}, 'taza': {'g': 180}}
+        table = get_conversion_table(conversions, _DEFAULTS)
+        lookup = get_conversion_lookup(conversions, _DEFAULTS)
+        for source, factors in table.items():
+            for dest, factor in factors.items():
+                self.assertAlmostEqual(lookup.factor(source, dest), factor)
+
+    def test_no_tables_are_built(self):
+        conversions._BASES.clear()
+        conversions._LOOKUPS.clear()
+        self.patch_object(Conversions, 'get_conversion_table',
+                          side_effect=AssertionError)
+        lookup = get_conversion_lookup({'u': {'g': 50}}, _DEFAULTS)
+        self.assertAlmostEqual(lookup.factor('u', 'g'), 50)
+
+    def test_cant_convert(self):
+        lookup = get_conversion_lookup({'u': {'g': 50}}, _DEFAULTS)
+        self.assertFalse(lookup.convertible('u', 'ml'))
+        self.assertRaises(CantConvert, lookup.factor, 'u', 'ml')
+
+    def test_unknown_unit(self):
+        lookup = get_conversion_lookup({}, _DEFAULTS)
+        self.assertNotIn('u', lookup)
+        self.assertRaises(CantConvert, lookup.factor, 'u', 'g')
+        self.assertEqual(lookup.units('u'), {})
+
+    def test_units(self):
+        lookup = get_conversion_lookup({}, _DEFAULTS)
+        units = lookup.units('kg')
+        self.assertEqual(set(units), {'kg', 'g'})
+        self.assertAlmostEqual(units['g'], 0.001)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+
+from pignacio_scripts.testing import TestCase
+
+from vld.ingredient import (IngredientMap, normalize_name,
+                            normalize_name_stats)
+from vld.objects import Ingredient, NutritionalValue
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def _ingredient(name, aliases=()):
+    return Ingredient(name=name,
+                      sample_size=100,
+                      sample_unit='g',
+                      sample_value=NutritionalValue(),
+                      aliases=list(aliases))
+
+
+class NormalizeNameTests(TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize_name(' Limón '), 'limon')
+
+    def test_memoized(self):
+        normalize_name('Café con leche')
+        before = normalize_name_stats()
+        self.assertEqual(normalize_name('Café con leche'), 'cafe con leche')
+        after = normalize_name_stats()
+        self.assertEqual(after.hits - before.hits, 1)
+        self.assertEqual(after.misses, before.misses)
+
+
+class IngredientMapTests(TestCase):
+    def setUp(self):
+        self.limon = _ingredient('Limón')
+        self.ingredients = IngredientMap([self.limon, _ingredient('pan')])
+
+    def test_lookup(self):
+        self.assertIs(self.ingredients[' LIMON'], self.limon)
+        self.assertIs(self.ingredients['limón'], self.limon)
+
+    def test_missing(self):
+        self.assertRaises(KeyError, self.ingredients.__getitem__, 'queso')
+
+    def test_exact_match_fast_path(self):
+        self.assertIs(self.ingredients['limon'], self.limon)
+        self.assertEqual(self.ingredients.exact_hits, 1)
+        self.ingredients['Limon']
+        self.assertEqual(self.ingredients.exact_hits, 1)
+
+    def test_iteration(self):
+        self.assertEqual(sorted(i.name for i in self.ingredients),
+                         ['Limón', 'pan'])
+        self.assertEqual(len(self.ingredients), 2)
+
+    def test_suggest(self):
+        self.assertEqual(self.ingredients.suggest('limones'), ['Limón'])
+
+    def test_with_prefix(self):
+        self.assertEqual(self.ingredients.with_prefix('LI'), ['Limón'])
+
+
+class IngredientMapAliasTests(TestCase):
+    def setUp(self):
+        self.huevo = _ingredient('huevo', aliases=['Huevos', 'egg'])
+        self.eggplant = _ingredient('egg plant')
+        self.ingredients = IngredientMap([self.huevo, self.eggplant])
+
+    def test_aliases_share_instance(self):
+        self.assertIs(self.ingredients['huevos'], self.huevo)
+        self.assertIs(self.ingredients['EGG'], self.huevo)
+        self.assertIs(self.ingredients['huevo'], self.huevo)
+
+    def test_iteration_skips_aliases(self):
+        self.assertEqual(len(self.ingredients), 2)
+        self.assertEqual(sorted(i.name for i in self.ingredients),
+                         ['egg plant', 'huevo'])
+
+    def test_names_take_precedence(self):
+        ingredients = IngredientMap([_ingredient('a', aliases=['b']),
+                                     _ingredient('b')])
+        self.assertEqual(ingredients['b'].name, 'b')
+
+    def test_suggestions_dedupe_aliases(self):
+        self.assertEqual(self.ingredients.suggest('huevoss'), ['huevo'])
+
+    def test_missing(self):
+        self.assertRaises(KeyError, self.ingredients.__getitem__, 'queso')
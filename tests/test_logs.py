@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+
+from pignacio_scripts.testing import TestCase
+
+from vld.logs import (DatedLogIndex, LogFileCache, LogWatcher, date_span,
+                      walk_log, walk_log_files)
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class WalkLogTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'log')
+        os.makedirs(os.path.join(self.root, '2015', '06'))
+        os.makedirs(os.path.join(self.root, '2015', 'empty'))
+        self._write('2015/06/01', 'leche, 200 ml\n2 u huevo\n')
+        self._write('2015/06/__init__', 'pan, 1 rebanada\n')
+        self._write('2015/05', 'agua, 1 l\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, filename, contents):
+        with open(os.path.join(self.root, filename), 'w') as fout:
+            fout.write(contents)
+
+    def test_walk_directory(self):
+        self.assertEqual(list(walk_log(self.root)), [
+            ((), None),
+            (('2015', ), None),
+            (('2015', '05'), None),
+            (('2015', '05'), 'agua, 1 l\n'),
+            (('2015', '06'), None),
+            (('2015', '06', '01'), None),
+            (('2015', '06', '01'), 'leche, 200 ml\n'),
+            (('2015', '06', '01'), '2 u huevo\n'),
+            (('2015', '06'), 'pan, 1 rebanada\n'),
+            (('2015', 'empty'), None),
+        ])  # yapf: disable
+
+    def test_walk_log_files(self):
+        self.assertEqual(list(walk_log_files(self.root)), [
+            ((), None),
+            (('2015', ), None),
+            (('2015', '05'), None),
+            (('2015', '05'), os.path.join(self.root, '2015', '05')),
+            (('2015', '06'), None),
+            (('2015', '06', '01'), None),
+            (('2015', '06', '01'), os.path.join(self.root, '2015', '06',
+                                                '01')),
+            (('2015', '06'), os.path.join(self.root, '2015', '06',
+                                          '__init__')),
+            (('2015', 'empty'), None),
+        ])  # yapf: disable
+
+    def test_walk_file(self):
+        self.assertEqual(list(walk_log(os.path.join(self.root, '2015/05'))),
+                         [((), None), ((), 'agua, 1 l\n')])
+
+    def test_trailing_slash(self):
+        self.assertEqual(list(walk_log(self.root + '/')),
+                         list(walk_log(self.root)))
+
+    def test_is_lazy(self):
+        records = walk_log(self.root)
+        next(records)
+        shutil.rmtree(os.path.join(self.root, '2015', '06'))
+        self.assertEqual(list(records)[-1], (('2015', 'empty'), None))
+
+
+class LogFileCacheTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.tmpdir, 'cache')
+        self.filename = os.path.join(self.tmpdir, 'log')
+        self._write('leche, 200 ml\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, contents):
+        with open(self.filename, 'w') as fout:
+            fout.write(contents)
+
+    def _saved_cache(self, key='key'):
+        cache = LogFileCache(self.cache_path, key)
+        self.assertFalse(cache.fresh(self.filename))
+        cache.put(self.filename, ['value'])
+        cache.save()
+        return LogFileCache(self.cache_path, key)
+
+    def test_hit(self):
+        cache = self._saved_cache()
+        self.assertTrue(cache.fresh(self.filename))
+        self.assertEqual(cache.get(self.filename), ['value'])
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_changed_file(self):
+        cache = self._saved_cache()
+        self._write('leche, 200 ml\n2 u huevo\n')
+        self.assertFalse(cache.fresh(self.filename))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_changed_key(self):
+        self._saved_cache()
+        cache = LogFileCache(self.cache_path, 'other')
+        self.assertFalse(cache.fresh(self.filename))
+
+    def test_deleted_files_are_dropped(self):
+        cache = self._saved_cache()
+        other = os.path.join(self.tmpdir, 'other')
+        with open(other, 'w') as fout:
+            fout.write('pan, 1 rebanada\n')
+        cache.fresh(other)
+        cache.put(other, ['other'])
+        os.remove(self.filename)
+        cache.save()
+        self.assertEqual(list(LogFileCache(self.cache_path, 'key')._entries),
+                         [os.path.abspath(other)])
+
+    def test_corrupt_cache(self):
+        with open(self.cache_path, 'w') as fout:
+            fout.write('garbage')
+        cache = LogFileCache(self.cache_path, 'key')
+        self.assertFalse(cache.fresh(self.filename))
+
+
+class LogWatcherTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'log')
+        os.makedirs(os.path.join(self.root, '06'))
+        self._write('06/01', 'leche, 200 ml\n')
+        self._write('06/__init__', 'pan, 1 rebanada\n')
+        self.watcher = LogWatcher(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, filename, contents):
+        with open(os.path.join(self.root, filename), 'w') as fout:
+            fout.write(contents)
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def test_first_poll(self):
+        self.assertEqual(self.watcher.poll(), ([
+            ((), None),
+            (('06', ), self._path('06', '__init__')),
+            (('06', '01'), self._path('06', '01')),
+        ], []))  # yapf: disable
+
+    def test_nothing_changed(self):
+        self.watcher.poll()
+        self.assertEqual(self.watcher.poll(), ([], []))
+
+    def test_changed_and_new_files(self):
+        self.watcher.poll()
+        self._write('06/01', 'leche, 1000 ml\n')
+        self._write('06/02', 'agua, 1 l\n')
+        self.assertEqual(self.watcher.poll(), ([
+            (('06', '01'), self._path('06', '01')),
+            (('06', '02'), self._path('06', '02')),
+        ], []))  # yapf: disable
+
+    def test_removed_files(self):
+        self.watcher.poll()
+        os.remove(self._path('06', '__init__'))
+        os.remove(self._path('06', '01'))
+        self.assertEqual(self.watcher.poll(),
+                         ([(('06', ), None)], [('06', '01')]))
+
+
+class DateSpanTests(TestCase):
+    def test_year(self):
+        self.assertEqual(date_span(('2016', )),
+                         (datetime.date(2016, 1, 1),
+                          datetime.date(2016, 12, 31)))
+
+    def test_month(self):
+        self.assertEqual(date_span(('2016', '02')),
+                         (datetime.date(2016, 2, 1),
+                          datetime.date(2016, 2, 29)))
+
+    def test_day(self):
+        day = datetime.date(2016, 2, 3)
+        self.assertEqual(date_span(('2016', '02', '03')), (day, day))
+        self.assertEqual(date_span(('2016', '02', '03', 'lunch')),
+                         (day, day))
+
+    def test_not_dates(self):
+        self.assertIsNone(date_span(()))
+        self.assertIsNone(date_span(('notes', )))
+        self.assertIsNone(date_span(('2016', '13')))
+        self.assertIsNone(date_span(('2016', '02', '30')))
+
+
+class DatedLogIndexTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmpdir, 'log')
+        os.makedirs(os.path.join(self.root, '2015', '06', '02'))
+        os.makedirs(os.path.join(self.root, '2015', '07'))
+        self._write('2015/06/01', 'leche, 200 ml\n')
+        self._write('2015/06/02/lunch', 'pan, 1 rebanada\n')
+        self._write('2015/06/__init__', 'agua, 1 l\n')
+        self._write('2015/06/notes', 'not a day\n')
+        self._write('2015/07/01', 'agua, 2 l\n')
+        self.index_path = os.path.join(self.tmpdir, 'log.index')
+        self.index = DatedLogIndex(self.index_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, filename, contents):
+        with open(os.path.join(self.root, filename), 'w') as fout:
+            fout.write(contents)
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _walk(self, path, since, until):
+        return list(self.index.walk(path, since, until))
+
+    def test_day_range(self):
+        self.assertEqual(
+            self._walk(self.root, datetime.date(2015, 6, 2),
+                       datetime.date(2015, 7, 1)), [
+                ((), None),
+                (('2015', ), None),
+                (('2015', '06'), None),
+                (('2015', '06', '02'), None),
+                (('2015', '06', '02', 'lunch'), None),
+                (('2015', '06', '02', 'lunch'),
+                 self._path('2015', '06', '02', 'lunch')),
+                (('2015', '07'), None),
+                (('2015', '07', '01'), None),
+                (('2015', '07', '01'), self._path('2015', '07', '01')),
+            ])  # yapf: disable
+
+    def test_whole_month_includes_init(self):
+        self.assertEqual(
+            self._walk(self.root, datetime.date(2015, 6, 1),
+                       datetime.date(2015, 6, 30))[-1],
+            (('2015', '06'), self._path('2015', '06', '__init__')))
+
+    def test_open_range_skips_non_dates(self):
+        self.assertEqual(
+            [f for _c, f in self._walk(self.root, None, None) if f], [
+                self._path('2015', '06', '01'),
+                self._path('2015', '06', '02', 'lunch'),
+                self._path('2015', '06', '__init__'),
+                self._path('2015', '07', '01'),
+            ])  # yapf: disable
+
+    def test_walk_from_month(self):
+        month = self._path('2015', '06')
+        self.assertEqual(
+            self._walk(month, datetime.date(2015, 6, 1),
+                       datetime.date(2015, 6, 1)), [
+                ((), None),
+                (('01', ), None),
+                (('01', ), self._path('2015', '06', '01')),
+            ])  # yapf: disable
+
+    def test_file_out_of_range(self):
+        day = self._path('2015', '07', '01')
+        self.assertEqual(self._walk(day, datetime.date(2015, 7, 2), None),
+                         [])
+
+    def test_only_needed_directories_are_listed(self):
+        self._walk(self.root, datetime.date(2015, 7, 1), None)
+        # log, 2015 and 07
+        self.assertEqual(self.index.listed, 3)
+
+    def test_persisted(self):
+        since = datetime.date(2015, 6, 1)
+        expected = self._walk(self.root, since, None)
+        self.index.save()
+        index = DatedLogIndex(self.index_path)
+        self.assertEqual(list(index.walk(self.root, since)), expected)
+        self.assertEqual(index.listed, 0)
+
+    def test_new_day_is_seen(self):
+        since = datetime.date(2015, 7, 1)
+        self._walk(self.root, since, None)
+        self.index.save()
+        self._write('2015/07/02', 'agua, 1 l\n')
+        # Keep the test independent of the filesystem's mtime resolution
+        month = self._path('2015', '07')
+        os.utime(month, (0, os.stat(month).st_mtime + 10))
+        index = DatedLogIndex(self.index_path)
+        self.assertIn((('2015', '07', '02'), self._path('2015', '07', '02')),
+                      list(index.walk(self.root, since)))
+        self.assertEqual(index.listed, 1)
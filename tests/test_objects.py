@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+import array
+import math
+import unittest
+
+from pignacio_scripts.testing import TestCase
+
+from vld import objects
+from vld.objects import Ingredient, LogColumns, LogData, NutritionalValue
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class IngredientBatchTests(TestCase):
+    def setUp(self):
+        self.huevo = Ingredient(name='huevo',
+                                sample_size=1,
+                                sample_unit='u',
+                                sample_value=NutritionalValue(calories=70,
+                                                              protein=6),
+                                conversions={'u': {'g': 50}})
+
+    def test_convert_many(self):
+        converted = self.huevo.convert_many([2, 100, 1], ['u', 'g', 'kg'],
+                                            'g')
+        self.assertEqual(list(converted), [100, 100, 1000])
+
+    def test_convert_many_cant_convert(self):
+        converted = self.huevo.convert_many([2, 1], ['u', 'ml'], 'g')
+        self.assertEqual(converted[0], 100)
+        self.assertTrue(math.isnan(converted[1]))
+
+    def test_get_nutritional_values_matches_single(self):
+        amounts, units = [2, 150], ['u', 'g']
+        values = self.huevo.get_nutritional_values(amounts, units)
+        width = len(NutritionalValue._fields)
+        for row, (amount, unit) in enumerate(zip(amounts, units)):
+            self.assertEqual(
+                NutritionalValue.from_row(
+                    values[row * width:(row + 1) * width]),
+                self.huevo.get_nutritional_value(amount, unit))
+
+    def test_get_nutritional_values_cant_convert(self):
+        values = self.huevo.get_nutritional_values([1], ['ml'])
+        self.assertEqual(NutritionalValue.from_row(values),
+                         NutritionalValue.UNKNOWN)
+
+
+class NutritionalValueSumTests(TestCase):
+    def test_sum(self):
+        total = NutritionalValue.sum([NutritionalValue(calories=10, fat=1),
+                                      NutritionalValue(calories=5.5)])
+        self.assertEqual(total.calories, 15.5)
+        self.assertEqual(total.fat, 1)
+        self.assertEqual(total.protein, 0)
+
+    def test_sum_empty(self):
+        self.assertEqual(tuple(NutritionalValue.sum([])),
+                         (0, ) * len(NutritionalValue._fields))
+
+    def test_sum_generator(self):
+        total = NutritionalValue.sum(NutritionalValue(calories=c)
+                                     for c in range(100))
+        self.assertEqual(total.calories, 4950)
+
+    def test_unknowns(self):
+        total, unknown = NutritionalValue.sum_with_unknowns([
+            NutritionalValue(calories=10, fat=1, protein=2),
+            NutritionalValue(calories=5, protein=1),
+        ])  # yapf: disable
+        self.assertEqual(total.protein, 3)
+        self.assertEqual(
+            set(unknown),
+            set(NutritionalValue._fields) - {'calories', 'protein'})
+
+    def test_no_unknowns(self):
+        full = NutritionalValue(*range(len(NutritionalValue._fields)))
+        self.assertEqual(NutritionalValue.sum_with_unknowns([full] * 50),
+                         (NutritionalValue(*[v * 50 for v in full]), ()))
+
+    def test_from_parts(self):
+        log = LogData.from_parts('all', [
+            LogData(name='a', nutritional_value=NutritionalValue(fat=2)),
+            LogData(name='b', nutritional_value=NutritionalValue.UNKNOWN),
+        ])  # yapf: disable
+        self.assertEqual(log.nutritional_value.fat, 2)
+        self.assertEqual(log.nutritional_value.calories, 0)
+
+    def test_from_parts_unknown_fields(self):
+        day = LogData.from_parts('day', [
+            LogData(name='a', nutritional_value=NutritionalValue(fat=2)),
+            LogData(name='b',
+                    nutritional_value=NutritionalValue(fat=1, calories=9)),
+        ])  # yapf: disable
+        self.assertNotIn('fat', day.unknown_fields)
+        self.assertIn('calories', day.unknown_fields)
+        full = NutritionalValue(*range(len(NutritionalValue._fields)))
+        log = LogData.from_parts('all', [
+            day, LogData(name='c', nutritional_value=full)])
+        self.assertEqual(log.unknown_fields, day.unknown_fields)
+        self.assertEqual(
+            LogData.from_parts('c', [LogData(name='c',
+                                             nutritional_value=full)])
+            .unknown_fields, ())
+
+
+class _SumRowsTests(object):
+    def setUp(self):
+        super(_SumRowsTests, self).setUp()
+        self.values = [NutritionalValue(calories=10, fat=1),
+                       NutritionalValue(calories=5.5, fat=2, protein=3),
+                       NutritionalValue(*range(len(NutritionalValue._fields)))]
+        self.matrix = array.array(str('d'))
+        for value in self.values:
+            self.matrix.extend(value.as_row())
+
+    def test_same_as_sum_with_unknowns(self):
+        self.assertEqual(NutritionalValue.sum_rows(self.matrix),
+                         NutritionalValue.sum_with_unknowns(self.values))
+
+    def test_row_range(self):
+        self.assertEqual(NutritionalValue.sum_rows(self.matrix, 1, 3),
+                         NutritionalValue.sum_with_unknowns(self.values[1:]))
+        self.assertEqual(NutritionalValue.sum_rows(self.matrix, 2),
+                         (self.values[2], ()))
+
+    def test_no_rows(self):
+        self.assertEqual(NutritionalValue.sum_rows(self.matrix, 1, 1),
+                         NutritionalValue.sum_with_unknowns([]))
+
+    def test_columns_total(self):
+        parts = [LogData(name='x', nutritional_value=v) for v in self.values]
+        columns = LogColumns()
+        for part in parts:
+            columns.append(part)
+        log = LogData.from_parts('all', parts)
+        self.assertEqual(columns.total(),
+                         (log.nutritional_value, log.unknown_fields))
+        self.assertEqual(LogColumns().total(),
+                         NutritionalValue.sum_with_unknowns([]))
+
+
+class PythonSumRowsTests(_SumRowsTests, TestCase):
+    def setUp(self):
+        super(PythonSumRowsTests, self).setUp()
+        self.patch_object(objects, 'numpy', None)
+
+
+@unittest.skipIf(objects.numpy is None, 'numpy is not installed')
+class NumpySumRowsTests(_SumRowsTests, TestCase):
+    pass
@@ -7,8 +7,13 @@ import logging
 
 from pignacio_scripts.testing import TestCase
 
-from vld.objects import LogLine
-from vld.parse import parse_log_line, ParseError
+from vld import parse
+from vld.ingredient import IngredientMap
+from vld.objects import LogData, LogLine, Ingredient, NutritionalValue
+from vld.parse import (parse_log_line, ParseError, LogLineParser,
+                       get_log_line_parser, parse_amount, parse_log_data,
+                       parse_log_data_stats, parse_log_lines,
+                       LogLineRecognizer)
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -90,3 +95,216 @@ class ParseLogLineTests(TestCase):
 
     def test_unit_plurals(self):
         self._test_parse("2 gs the ing", "the ing", 2, "g", valid_units=("g",))
+
+    def test_mixed_number_amount(self):
+        self._test_parse("1 1/2 unit of the ing", "the ing", 1.5, "unit")
+
+    def test_comma_mixed_number_amount(self):
+        self._test_parse("the ing, 2 1/4 unit", "the ing", 2.25, "unit")
+
+    def test_invalid_amount(self):
+        self.assertRaisesRegexp(ParseError, "is not a valid amount",
+                                parse_log_line, "the ing, 1.2.3 unit")
+
+
+class ParseAmountTests(TestCase):
+    def test_integer(self):
+        self.assertEqual(parse_amount("2"), 2)
+
+    def test_decimal(self):
+        self.assertEqual(parse_amount("0.25"), 0.25)
+
+    def test_fraction(self):
+        self.assertEqual(parse_amount("3/4"), 0.75)
+
+    def test_spaced_fraction(self):
+        self.assertEqual(parse_amount("3 / 4"), 0.75)
+
+    def test_mixed_number(self):
+        self.assertEqual(parse_amount("1 1/2"), 1.5)
+
+    def test_zero_denominator(self):
+        self.assertRaises(ParseError, parse_amount, "1/0")
+
+    def test_code_is_not_evaluated(self):
+        self.assertRaises(ParseError, parse_amount, "__import__('os')")
+
+
+class LogLineParserTests(TestCase):
+    def test_parse(self):
+        parser = LogLineParser(valid_units=('g', 'kg'))
+        self.assertEqual(parser.parse("leche, 2 kg"),
+                         LogLine(name="leche", amount=2, unit="kg"))
+
+    def test_parse_second_form(self):
+        parser = LogLineParser(valid_units=('g', 'kg'))
+        self.assertEqual(parser.parse("200 g de leche"),
+                         LogLine(name="leche", amount=200, unit="g"))
+
+    def test_invalid_line(self):
+        parser = LogLineParser(valid_units=('g', ))
+        self.assertRaises(ParseError, parser.parse, "leche")
+
+    def test_parsers_are_cached(self):
+        self.assertIs(get_log_line_parser(('a', 'b'), 'e'),
+                      get_log_line_parser(['b', 'a'], 'e'))
+
+    def test_parsers_found_by_arguments(self):
+        for units in [('c', 'd'), ['d', 'c']]:
+            parser = get_log_line_parser(units)
+            hits = parse._PARSERS.stats().hits
+            self.assertIs(get_log_line_parser(units), parser)
+            self.assertEqual(parse._PARSERS.stats().hits, hits)
+
+    def test_parsers_differ_by_empty_unit(self):
+        self.assertIsNot(get_log_line_parser(('a', 'b'), 'e'),
+                         get_log_line_parser(('a', 'b'), None))
+
+
+class ParseLogDataTests(TestCase):
+    def setUp(self):
+        self.leche = Ingredient(name='leche',
+                                sample_size=100,
+                                sample_unit='ml',
+                                sample_value=NutritionalValue(calories=50))
+        self.ingredients = IngredientMap([self.leche])
+
+    def test_parse(self):
+        data = parse_log_data("leche, 200 ml", self.ingredients)
+        self.assertEqual(data.nutritional_value.calories, 100)
+        self.assertEqual(data.log_line.ingredient, self.leche)
+
+    def test_repeated_lines_are_memoized(self):
+        before = parse_log_data_stats()
+        first = parse_log_data("leche, 300 ml", self.ingredients)
+        second = parse_log_data("  leche, 300 ml\n", self.ingredients)
+        after = parse_log_data_stats()
+        self.assertIs(first, second)
+        self.assertEqual(after.misses - before.misses, 1)
+        self.assertEqual(after.hits - before.hits, 1)
+
+    def test_new_ingredient_map_is_not_memoized(self):
+        first = parse_log_data("leche, 400 ml", self.ingredients)
+        second = parse_log_data("leche, 400 ml", IngredientMap([self.leche]))
+        self.assertIsNot(first, second)
+        self.assertEqual(first, second)
+
+    def test_invalid_ingredient_suggestions(self):
+        self.assertRaisesRegexp(ParseError, 'did you mean "leche"',
+                                parse_log_data, "lechr, 1 l",
+                                self.ingredients)
+
+    def test_memoized_errors_are_raised(self):
+        for _ in range(2):
+            self.assertRaisesRegexp(ParseError, "Invalid ingredient",
+                                    parse_log_data, "agua, 1 l",
+                                    self.ingredients)
+
+    def test_comment_value(self):
+        data = parse_log_data("algo # k: 120", self.ingredients)
+        self.assertEqual(data.nutritional_value.calories, 120)
+
+
+class ParseLogLinesTests(TestCase):
+    def setUp(self):
+        self.leche = Ingredient(name='leche',
+                                sample_size=100,
+                                sample_unit='ml',
+                                sample_value=NutritionalValue(calories=50,
+                                                              protein=3))
+        self.ingredients = IngredientMap([self.leche])
+        self.columns = parse_log_lines(
+            ["leche, 200 ml", "", "# comment", "agua, 1 l",
+             "leche, 1 l"], self.ingredients)
+
+    def test_skips_empty_and_comment_lines(self):
+        self.assertEqual(len(self.columns), 3)
+
+    def test_ingredient_ids(self):
+        self.assertEqual(self.columns.ingredients, [self.leche])
+        self.assertEqual(list(self.columns.ingredient_ids), [0, -1, 0])
+
+    def test_unit_ids(self):
+        self.assertEqual(self.columns.units, ['ml', 'l'])
+        self.assertEqual(list(self.columns.unit_ids), [0, -1, 1])
+
+    def test_incomplete_mask(self):
+        self.assertEqual(list(self.columns.incomplete), [0, 1, 0])
+
+    def test_nutrient_row(self):
+        self.assertEqual(self.columns.nutrient_row(0),
+                         NutritionalValue(calories=100, protein=6))
+        self.assertEqual(self.columns.nutrient_row(1),
+                         NutritionalValue.UNKNOWN)
+
+    def test_unmatched_leaf(self):
+        self.assertEqual(self.columns.leaf(1),
+                         LogData(name="agua, 1 l",
+                                 nutritional_value=NutritionalValue.UNKNOWN,
+                                 incomplete=True,
+                                 is_leaf=True))
+
+    def test_total(self):
+        total, unknown = self.columns.total()
+        self.assertEqual(total.calories, 600)
+        self.assertEqual(total.protein, 36)
+        self.assertEqual(total.fat, 0)
+        self.assertIn('fat', unknown)
+        self.assertIn('calories', unknown)
+
+
+class LogLineRecognizerTests(TestCase):
+    def setUp(self):
+        self.merluza = Ingredient(name='merluza',
+                                  sample_size=100,
+                                  sample_unit='g',
+                                  sample_value=NutritionalValue(calories=90),
+                                  conversions={'filet': {'g': 150},
+                                               'filet grande': {'g': 250}})
+        self.leche = Ingredient(name='leche',
+                                sample_size=100,
+                                sample_unit='ml',
+                                sample_value=NutritionalValue(calories=50))
+        self.recognizer = LogLineRecognizer(
+            IngredientMap([self.merluza, self.leche]))
+
+    def _test_recognize(self, string, name, amount, unit, ingredient):
+        self.assertEqual(self.recognizer.recognize(string),
+                         LogLine(name=name,
+                                 amount=amount,
+                                 unit=unit,
+                                 ingredient=ingredient))
+
+    def test_comma_form(self):
+        self._test_recognize("leche, 1/2 taza", "leche", 0.5, "taza",
+                             self.leche)
+
+    def test_comma_form_plural(self):
+        self._test_recognize("leche, 2 tazas", "leche", 2, "taza",
+                             self.leche)
+
+    def test_quantity_form(self):
+        self._test_recognize("200 ml leche", "leche", 200, "ml", self.leche)
+
+    def test_quantity_form_connector(self):
+        self._test_recognize("2 vasos de leche", "leche", 2, "vaso",
+                             self.leche)
+
+    def test_unit_with_spaces_is_found_by_ingredient(self):
+        self._test_recognize("1 filet grande merluza", "merluza", 1,
+                             "filet grande", self.merluza)
+
+    def test_shorter_unit(self):
+        self._test_recognize("2 filets de merluza", "merluza", 2, "filet",
+                             self.merluza)
+
+    def test_unit_not_valid_for_ingredient(self):
+        self.assertIsNone(self.recognizer.recognize("1 filet leche"))
+
+    def test_unknown_ingredient(self):
+        self.assertIsNone(self.recognizer.recognize("agua, 1 l"))
+
+    def test_parse_log_data_uses_ingredient_units(self):
+        data = parse_log_data("1 filet grande de merluza",
+                              IngredientMap([self.merluza]))
+        self.assertEqual(data.nutritional_value.calories, 225)
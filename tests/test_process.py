@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+import os
+import shutil
+import tempfile
+
+from pignacio_scripts.testing import TestCase
+
+from vld.aggregate import iter_leaves
+from vld.ingredient import IngredientMap
+from vld.logs import LogFileCache
+from vld.objects import Ingredient, NutritionalValue
+from vld.process import (_attach_ingredient, _detach_ingredient, make_leaf,
+                         process_paths, process_paths_columns)
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class ProcessPathsTests(TestCase):
+    def setUp(self):
+        self.leche = Ingredient(name='leche',
+                                sample_size=100,
+                                sample_unit='ml',
+                                sample_value=NutritionalValue(calories=50))
+        self.pan = Ingredient(name='pan',
+                              sample_size=1,
+                              sample_unit='rebanada',
+                              sample_value=NutritionalValue(calories=80))
+        self.ingredients = IngredientMap([self.leche, self.pan])
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = [os.path.join(self.tmpdir, 'log'),
+                      os.path.join(self.tmpdir, 'other')]
+        os.makedirs(os.path.join(self.tmpdir, 'log', '2015', '06'))
+        os.makedirs(os.path.join(self.tmpdir, 'other'))
+        self._write('log/2015/06/01', 'leche, 200 ml\n# comment\n\n')
+        self._write('log/2015/06/02', 'pan, 2 rebanada\nalgo raro\n')
+        self._write('log/2015/06/__init__', 'leche, 1 l\n')
+        self._write('log/2015/05', 'pan, 1 rebanada\n')
+        self._write('other/01', 'leche, 100 ml\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, filename, contents):
+        with open(os.path.join(self.tmpdir, filename), 'w') as fout:
+            fout.write(contents)
+
+    def _process(self, **kwargs):
+        return process_paths(self.paths, self.ingredients, **kwargs)
+
+    def _ingredients(self, logs):
+        return [leaf.log_line and leaf.log_line.ingredient
+                for log in logs for leaf in iter_leaves(log)]
+
+    def test_jobs(self):
+        sequential = self._process(jobs=1)
+        parallel = self._process(jobs=2)
+        self.assertEqual(parallel, sequential)
+        self.assertEqual([log.name for log in parallel], ['log', 'other'])
+        self.assertEqual(parallel[0].nutritional_value.calories, 840)
+        self.assertTrue(parallel[0].incomplete)
+
+    def test_jobs_attach_ingredients(self):
+        expected = [self.pan, self.leche, self.pan, None, self.leche,
+                    self.leche]
+        for jobs in [1, 2]:
+            ingredients = self._ingredients(self._process(jobs=jobs))
+            self.assertEqual(len(ingredients), len(expected))
+            for ingredient, expected_ingredient in zip(ingredients, expected):
+                self.assertIs(ingredient, expected_ingredient)
+
+    def test_cache(self):
+        expected = self._process()
+        cache_path = os.path.join(self.tmpdir, 'cache')
+        for jobs in [1, 2, 2]:
+            cache = LogFileCache(cache_path, 'key')
+            self.assertEqual(self._process(jobs=jobs, cache=cache), expected)
+            cache.save()
+        self.assertEqual((cache.hits, cache.misses), (5, 0))
+
+    def test_columns(self):
+        leaves = [leaf for log in self._process() for leaf in iter_leaves(log)]
+        cache = LogFileCache(os.path.join(self.tmpdir, 'cache'), 'key')
+        for kwargs in [{}, {'jobs': 2}, {'cache': cache}]:
+            columns = process_paths_columns(self.paths, self.ingredients,
+                                            **kwargs)
+            self.assertEqual(columns.names, [leaf.name for leaf in leaves])
+            self.assertEqual(columns.ingredients, [self.pan, self.leche])
+            self.assertEqual(list(columns.incomplete),
+                             [leaf.incomplete for leaf in leaves])
+
+    def test_detach_ingredient(self):
+        leaf = make_leaf('leche, 200 ml', self.ingredients)
+        detached = _detach_ingredient(leaf)
+        self.assertEqual(detached.log_line.ingredient, 'leche')
+        self.assertEqual(_attach_ingredient(detached, self.ingredients), leaf)
+
+    def test_detach_unmatched(self):
+        leaf = make_leaf('algo raro', self.ingredients)
+        self.assertIs(_detach_ingredient(leaf), leaf)
+        self.assertIs(_attach_ingredient(leaf, self.ingredients), leaf)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import io
+import logging
+
+from pignacio_scripts.testing import TestCase
+
+from vld import render
+from vld.objects import LogData, NutritionalValue
+from vld.render import print_log, render_log
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+_LOG = 'log:        180.0 kCal (23.0 nc,  9.0 p,  6.0 f) [ 2.0 df] !\n'
+_DAY = ' 01:        100.0 kCal (10.0 nc,  6.0 p,  5.0 f) [ 0.0 df] !\n'
+_LECHE = '  leche:    100.0 kCal (10.0 nc,  6.0 p,  5.0 f) [ 0.0 df]  \n'
+_ALGO = '  algo:       ??? kCal ( ??? nc,  ??? p,  ??? f) [ ??? df]*!\n'
+_PAN = ' pan:        80.0 kCal (13.0 nc,  3.0 p,  1.0 f) [ 2.0 df]  \n'
+
+
+def _leaf(name, **kwargs):
+    return LogData(name=name,
+                   nutritional_value=NutritionalValue(**kwargs),
+                   is_leaf=True)
+
+
+class PrintLogTests(TestCase):
+    def setUp(self):
+        self.log = LogData.from_parts('log', [
+            LogData.from_parts('01', [
+                _leaf('leche', calories=100, protein=6, fat=5, carbs=10,
+                      fiber=0),
+                LogData(name='algo',
+                        nutritional_value=NutritionalValue.UNKNOWN,
+                        incomplete=True),
+            ]),
+            _leaf('pan', calories=80, protein=3, fat=1, carbs=15, fiber=2),
+        ])  # yapf: disable
+
+    def _print(self, **kwargs):
+        out = io.StringIO()
+        print_log(self.log, width=60, out=out, **kwargs)
+        return out.getvalue()
+
+    def test_output(self):
+        self.assertEqual(
+            self._print(),
+            ''.join([_LOG, _DAY, _LECHE, _ALGO, '\n', _PAN, '\n']))
+
+    def test_max_levels(self):
+        self.assertEqual(self._print(max_levels=0), _LOG)
+        self.assertEqual(self._print(max_levels=1),
+                         ''.join([_LOG, _DAY, _PAN, '\n']))
+        self.assertEqual(self._print(max_levels=2), self._print())
+
+    def test_no_colors_when_not_a_tty(self):
+        self.assertNotIn('\x1b', self._print())
+        self.assertIn('\x1b', self._print(color=True))
+
+    def test_chunked_writes(self):
+        self.patch_object(render, '_RENDER_CHUNK_SIZE', 100)
+        self.assertEqual(
+            self._print(),
+            ''.join([_LOG, _DAY, _LECHE, _ALGO, '\n', _PAN, '\n']))
+
+    def test_render_level(self):
+        lines = list(render_log(self.log.parts[1], level=1, width=60,
+                                color=False))
+        self.assertEqual(lines, [_PAN])
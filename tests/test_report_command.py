@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import importlib
+import logging
+import sys
+import unittest
+
+from pignacio_scripts.testing import TestCase
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+@unittest.skipIf(sys.version_info[0] > 2, 'vld.commands is Python 2 only')
+class UsesReportCacheTests(TestCase):
+    def setUp(self):
+        self.report = importlib.import_module('vld.commands.report')
+
+    def _uses_cache(self, *args):
+        parser = self.report.get_argument_parser()
+        options = parser.parse_args(list(args) + ['log'])
+        return self.report.uses_report_cache(options)
+
+    def test_full_report(self):
+        self.assertTrue(self._uses_cache())
+        self.assertFalse(self._uses_cache('--no-cache'))
+
+    def test_date_range(self):
+        self.assertFalse(self._uses_cache('--since', '2015-06-01'))
+        self.assertFalse(self._uses_cache('--watch', '--until', '2015-06-30'))
+
+    def test_compact(self):
+        self.assertFalse(self._uses_cache('--compact'))
+        self.assertFalse(self._uses_cache('--compact', '--by-category'))
+        self.assertTrue(self._uses_cache('--compact', '--watch'))
+
+    def test_depth(self):
+        self.assertFalse(self._uses_cache('-d', '2'))
+        self.assertTrue(self._uses_cache('-d', '2', '--by-ingredient'))
+        self.assertTrue(self._uses_cache('-d', '2', '--watch'))
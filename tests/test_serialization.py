@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from pignacio_scripts.testing import TestCase
+
+from vld import serialization
+from vld.serialization import (load_ingredients, load_ingredient_map,
+                               get_cache_path, get_index_path)
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def _ingredient(name, calories):
+    return {
+        'name': name,
+        'sample_size': 100,
+        'sample_unit': 'g',
+        'sample_value': {'calories': calories},
+    }  # yapf: disable
+
+
+class LoadIngredientsTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmpdir, 'ingredients')
+        os.makedirs(os.path.join(self.directory, 'sub'))
+        self._write('a.json', [_ingredient('pan', 270)])
+        self._write('sub/b.json', _ingredient('arroz', 130))
+        self._write('bad.json', None, raw='{bad')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, filename, data, raw=None):
+        with open(os.path.join(self.directory, filename), 'w') as fout:
+            fout.write(raw if raw is not None else json.dumps(data))
+
+    def _names(self, ingredients):
+        return [i.name for i in ingredients]
+
+    def test_load(self):
+        ingredients = load_ingredients(self.directory, use_cache=False)
+        self.assertEqual(self._names(ingredients), ['pan', 'arroz'])
+        self.assertFalse(os.path.exists(get_cache_path(self.directory)))
+
+    def test_writes_cache(self):
+        ingredients = load_ingredients(self.directory)
+        self.assertEqual(self._names(ingredients), ['pan', 'arroz'])
+        self.assertTrue(os.path.exists(get_cache_path(self.directory)))
+        self.assertEqual(load_ingredients(self.directory), ingredients)
+
+    def test_reads_cache(self):
+        load_ingredients(self.directory)
+        files = serialization._ingredient_files(self.directory)
+        serialization._write_cache(get_cache_path(self.directory),
+                                   serialization._files_signature(files),
+                                   ['cached'])
+        self.assertEqual(load_ingredients(self.directory), ['cached'])
+
+    def test_changed_file_invalidates_cache(self):
+        load_ingredients(self.directory)
+        self._write('a.json', [_ingredient('pan', 270),
+                               _ingredient('avena', 380)])
+        self.assertEqual(self._names(load_ingredients(self.directory)),
+                         ['pan', 'avena', 'arroz'])
+
+    def test_new_file_invalidates_cache(self):
+        load_ingredients(self.directory)
+        self._write('c.json', _ingredient('queso', 300))
+        self.assertEqual(self._names(load_ingredients(self.directory)),
+                         ['pan', 'queso', 'arroz'])
+
+    def test_parallel_load(self):
+        for index in range(10):
+            self._write('sub/c{}.json'.format(index),
+                        _ingredient('extra{}'.format(index), index))
+        self.assertEqual(
+            load_ingredients(self.directory, use_cache=False, processes=3),
+            load_ingredients(self.directory, use_cache=False))
+
+    def test_corrupt_cache_is_rebuilt(self):
+        with open(get_cache_path(self.directory), 'w') as fout:
+            fout.write('garbage')
+        self.assertEqual(self._names(load_ingredients(self.directory)),
+                         ['pan', 'arroz'])
+
+
+class LoadIngredientMapTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.tmpdir, 'ingredients')
+        os.makedirs(self.directory)
+        self._write('a.json', [_ingredient('Pan', 270),
+                               _ingredient('Avena', 380)])
+        self._write('b.json', _ingredient('arroz', 130))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, filename, data):
+        with open(os.path.join(self.directory, filename), 'w') as fout:
+            json.dump(data, fout)
+
+    def test_lookup(self):
+        ingredients = load_ingredient_map(self.directory)
+        self.assertEqual(ingredients['avena '].sample_value.calories, 380)
+        self.assertEqual(ingredients['arroz'].name, 'arroz')
+        self.assertRaises(KeyError, ingredients.__getitem__, 'queso')
+
+    def test_loads_on_first_access(self):
+        ingredients = load_ingredient_map(self.directory)
+        self.assertEqual(ingredients._ingredients, {})
+        self.assertIs(ingredients['pan'], ingredients['PAN'])
+        self.assertEqual(list(ingredients._ingredients), ['pan'])
+
+    def test_iteration_sees_all(self):
+        ingredients = load_ingredient_map(self.directory)
+        self.assertEqual(len(ingredients), 3)
+        self.assertEqual(sorted(i.name for i in ingredients),
+                         ['Avena', 'Pan', 'arroz'])
+
+    def test_aliases(self):
+        data = _ingredient('huevo', 70)
+        data['aliases'] = ['huevos', 'egg']
+        self._write('c.json', data)
+        ingredients = load_ingredient_map(self.directory)
+        self.assertIs(ingredients['Huevos'], ingredients['egg'])
+        self.assertEqual(ingredients['egg'].name, 'huevo')
+        self.assertEqual(len(ingredients), 4)
+
+    def test_units(self):
+        ingredients = load_ingredient_map(self.directory)
+        self.assertIn('g', ingredients.units())
+
+    def test_writes_index(self):
+        load_ingredient_map(self.directory)
+        self.assertTrue(os.path.exists(get_index_path(self.directory)))
+
+    def test_changed_file_invalidates_index(self):
+        load_ingredient_map(self.directory)
+        self._write('b.json', [_ingredient('queso', 300),
+                               _ingredient('arroz', 130)])
+        ingredients = load_ingredient_map(self.directory)
+        self.assertEqual(ingredients['arroz'].name, 'arroz')
+        self.assertEqual(ingredients['queso'].name, 'queso')
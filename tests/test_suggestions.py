@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+
+from pignacio_scripts.testing import TestCase
+
+from vld.suggestions import NameIndex
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class NameIndexTests(TestCase):
+    def setUp(self):
+        self.index = NameIndex(['leche', 'leche descremada', 'lenteja',
+                                'huevo', 'pan', 'pan integral', 'papa'])
+
+    def test_with_prefix(self):
+        self.assertEqual(self.index.with_prefix('pa'),
+                         ['pan', 'pan integral', 'papa'])
+
+    def test_with_prefix_limit(self):
+        self.assertEqual(self.index.with_prefix('le', limit=1), ['leche'])
+
+    def test_with_prefix_none(self):
+        self.assertEqual(self.index.with_prefix('x'), [])
+
+    def test_closest_typo(self):
+        self.assertEqual(self.index.closest('lehce', limit=1), ['leche'])
+
+    def test_closest_order(self):
+        self.assertEqual(self.index.closest('leche', limit=2),
+                         ['leche', 'leche descremada'])
+
+    def test_closest_plural(self):
+        self.assertEqual(self.index.closest('huevos', limit=1), ['huevo'])
+
+    def test_closest_nothing_similar(self):
+        self.assertEqual(self.index.closest('zzz'), [])
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+
+from pignacio_scripts.testing import TestCase
+
+from vld.objects import LogData, LogLine, NutritionalValue
+from vld.tree import CompactLogTree, LogTree, build_log, build_log_to_depth
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def _leaf(name, calories, incomplete=False):
+    return LogData(name=name,
+                   nutritional_value=NutritionalValue(calories=calories),
+                   incomplete=incomplete,
+                   is_leaf=True)
+
+
+class LogTreeTests(TestCase):
+    def setUp(self):
+        self.records = [
+            ((), None),
+            (('2015', ), None),
+            (('2015', '05'), None),
+            (('2015', '05'), _leaf('agua', 0)),
+            (('2015', '06'), None),
+            (('2015', '06', '01'), None),
+            (('2015', '06', '01'), _leaf('leche', 100)),
+            (('2015', '06', '01'), _leaf('huevo', 150, incomplete=True)),
+            (('2015', '06'), _leaf('pan', 80)),
+            (('2015', 'empty'), None),
+        ]  # yapf: disable
+        self.tree = LogTree.from_records('log', self.records)
+
+    def _expected(self):
+        day = LogData.from_parts('01', [_leaf('leche', 100),
+                                        _leaf('huevo', 150, True)])
+        month = LogData.from_parts('06', [day, _leaf('pan', 80)])
+        year = LogData.from_parts('2015', [
+            LogData.from_parts('05', [_leaf('agua', 0)]),
+            month,
+            LogData.from_parts('empty', []),
+        ])  # yapf: disable
+        return LogData.from_parts('log', [year])
+
+    def _calories(self, components=()):
+        return self.tree.log_data(components).nutritional_value.calories
+
+    def _summary(self, log_data):
+        return (log_data.name, log_data.nutritional_value.calories,
+                log_data.incomplete, [self._summary(p)
+                                      for p in log_data.parts])
+
+    def test_log_data(self):
+        log_data = self.tree.log_data()
+        self.assertEqual(self._summary(log_data),
+                         self._summary(self._expected()))
+        self.assertEqual(log_data.nutritional_value.calories, 330)
+        self.assertTrue(log_data.incomplete)
+
+    def test_set_leaves_updates_path(self):
+        old_hash = self.tree.hash
+        changed = self.tree.set_leaves(('2015', '06', '01'),
+                                       [_leaf('leche', 200)])
+        self.assertTrue(changed)
+        self.assertEqual(self._calories(('2015', '06', '01')), 200)
+        self.assertEqual(self._calories(('2015', '06')), 280)
+        self.assertEqual(self._calories(), 280)
+        self.assertFalse(self.tree.log_data().incomplete)
+        self.assertNotEqual(self.tree.hash, old_hash)
+
+    def test_totals(self):
+        self.assertEqual(self.tree.totals().calories, 330)
+        self.tree.set_leaves(('2015', '06'), [])
+        self.assertEqual(self.tree.totals(('2015', '06')).calories, 250)
+        self.assertEqual(self.tree.totals().calories, 250)
+
+    def test_set_same_leaves_is_noop(self):
+        old_hash = self.tree.hash
+        view = self.tree.log_data()
+        changed = self.tree.set_leaves(
+            ('2015', '06', '01'),
+            [_leaf('leche', 100), _leaf('huevo', 150, incomplete=True)])
+        self.assertFalse(changed)
+        self.assertEqual(self.tree.hash, old_hash)
+        self.assertIs(self.tree.log_data(), view)
+
+    def test_unchanged_subtrees_keep_views(self):
+        may = self.tree.log_data(('2015', '05'))
+        self.tree.set_leaves(('2015', '06', '01'), [])
+        self.assertIs(self.tree.log_data(('2015', '05')), may)
+
+    def test_hash_depends_only_on_contents(self):
+        # Same nodes, built in a different order
+        other = LogTree.from_records(
+            'log', sorted(self.records, key=lambda r: r[0], reverse=True))
+        self.assertEqual(other.hash, self.tree.hash)
+        self.tree.set_leaves(('2015', '05'), [_leaf('agua', 1)])
+        self.assertNotEqual(other.hash, self.tree.hash)
+        self.tree.set_leaves(('2015', '05'), [_leaf('agua', 0)])
+        self.assertEqual(other.hash, self.tree.hash)
+
+    def test_hash_independent_of_construction(self):
+        leaf = _leaf('pan', 80)
+        tree = LogTree('log')
+        self.assertTrue(tree.set_leaves(('2015', '06'), [leaf]))
+        other = LogTree.from_records('log', [
+            ((), None),
+            (('2015', ), None),
+            (('2015', '06'), None),
+            (('2015', '06'), leaf),
+        ])  # yapf: disable
+        self.assertEqual(tree.hash, other.hash)
+
+    def test_set_no_leaves(self):
+        tree = LogTree('log')
+        self.assertFalse(tree.set_leaves((), []))
+        old_hash = tree.hash
+        # Creating an empty node is a change
+        self.assertTrue(tree.set_leaves(('2015', ), []))
+        self.assertNotEqual(tree.hash, old_hash)
+        self.assertFalse(tree.set_leaves(('2015', ), []))
+
+    def test_remove(self):
+        other = LogTree.from_records('log', [
+            r for r in self.records if r[0][:2] != ('2015', '06')
+        ])
+        self.tree.remove(('2015', '06'))
+        self.assertEqual(self._calories(), 0)
+        self.assertFalse(self.tree.log_data().incomplete)
+        self.assertEqual(self.tree.hash, other.hash)
+        self.assertNotIn(('2015', '06'), self.tree)
+        self.assertIn(('2015', '05'), self.tree)
+
+    def test_remove_root(self):
+        with self.assertRaises(ValueError):
+            self.tree.remove(())
+
+
+class CompactLogTreeTests(TestCase):
+    def setUp(self):
+        self.leche = LogLine(name='leche', amount=200., unit='ml')
+        self.records = [
+            ((), None),
+            (('2015', ), None),
+            (('2015', '05'), None),
+            (('2015', '05'), _leaf('agua', 0)),
+            (('2015', '06'), None),
+            (('2015', '06', '01'), None),
+            (('2015', '06', '01'),
+             _leaf('leche', 100)._replace(log_line=self.leche)),
+            (('2015', '06', '01'), _leaf('huevo', 150, incomplete=True)),
+            (('2015', '06'), _leaf('pan', 80)),
+            (('2015', 'empty'), None),
+        ]  # yapf: disable
+        self.tree = CompactLogTree.from_records('log', self.records)
+
+    def _summary(self, log_data):
+        return (log_data.name, tuple(log_data.nutritional_value),
+                log_data.incomplete, log_data.is_leaf,
+                log_data.unknown_fields,
+                [self._summary(p) for p in log_data.parts])
+
+    def test_same_as_log_tree(self):
+        self.assertEqual(
+            self._summary(self.tree.log_data()),
+            self._summary(LogTree.from_records('log',
+                                               self.records).log_data()))
+
+    def test_structure(self):
+        self.assertEqual(len(self.tree), 10)
+        self.assertEqual(list(self.tree.parents),
+                         [-1, 0, 1, 2, 1, 4, 5, 5, 4, 1])
+        self.assertEqual(list(self.tree.children(1)), [2, 4, 9])
+        self.assertEqual(list(self.tree.children(4)), [5, 8])
+        self.assertEqual(list(self.tree.children(9)), [])
+
+    def test_interned_strings(self):
+        tree = CompactLogTree.from_records('log', [
+            (('01', ), _leaf('pan', 80)),
+            (('02', ), _leaf('pan', 80)),
+        ])  # yapf: disable
+        self.assertEqual(sorted(tree.strings), ['01', '02', 'log', 'pan'])
+
+    def test_unknown_values(self):
+        leaf = self.tree.log_data().parts[0].parts[0].parts[0]
+        self.assertEqual(leaf.name, 'agua')
+        self.assertIsNone(leaf.nutritional_value.protein)
+        self.assertEqual(self.tree.log_data().nutritional_value.protein, 0)
+        self.assertEqual(leaf.unknown_fields, ())
+        self.assertIn('protein', self.tree.log_data().unknown_fields)
+
+    def test_log_line(self):
+        day = self.tree.log_data().parts[0].parts[1].parts[0]
+        leche, huevo = day.parts
+        self.assertEqual(leche.log_line, self.leche)
+        self.assertIsNone(huevo.log_line)
+        self.assertTrue(day.incomplete)
+        self.assertFalse(leche.incomplete)
+
+
+class BuildLogToDepthTests(TestCase):
+    def setUp(self):
+        self.records = [
+            ((), None),
+            ((), _leaf('cafe', 5)),
+            (('2015', ), None),
+            (('2015', '05'), None),
+            (('2015', '05'), _leaf('agua', 0)),
+            (('2015', '06'), None),
+            (('2015', '06', '01'), None),
+            (('2015', '06', '01'), _leaf('leche', 100)),
+            (('2015', '06', '01'), _leaf('huevo', 150, incomplete=True)),
+            (('2015', '06', '01'),
+             _leaf('algo', 0)._replace(
+                 nutritional_value=NutritionalValue.UNKNOWN)),
+            (('2015', '06'), _leaf('pan', 80)),
+            (('2015', 'empty'), None),
+        ]  # yapf: disable
+
+    def _summary(self, log_data, max_depth, depth=0):
+        parts = log_data.parts if depth < max_depth else []
+        return (log_data.name, tuple(log_data.nutritional_value),
+                log_data.incomplete, log_data.unknown_fields,
+                [self._summary(p, max_depth, depth + 1) for p in parts])
+
+    def _assert_same(self, max_depth):
+        self.assertEqual(
+            self._summary(build_log_to_depth('log', self.records, max_depth),
+                          max_depth),
+            self._summary(build_log('log', self.records), max_depth))
+
+    def test_depth_0(self):
+        self._assert_same(0)
+        log = build_log_to_depth('log', self.records, 0)
+        self.assertEqual(log.parts, [])
+        self.assertEqual(log.nutritional_value.calories, 335)
+        self.assertEqual(log.nutritional_value.protein, 0)
+        self.assertTrue(log.incomplete)
+        self.assertIn('protein', log.unknown_fields)
+
+    def test_depth_1(self):
+        self._assert_same(1)
+
+    def test_depth_2(self):
+        self._assert_same(2)
+        year = build_log_to_depth('log', self.records, 2).parts[1]
+        may, june, empty = year.parts
+        self.assertEqual(june.parts, [])
+        self.assertTrue(june.incomplete)
+        self.assertFalse(may.incomplete)
+        self.assertEqual(empty.nutritional_value.calories, 0)
+
+    def test_deeper_than_log(self):
+        self._assert_same(10)
+
+    def test_build_log_max_depth(self):
+        self.assertEqual(
+            self._summary(build_log('log', self.records, max_depth=1), 10),
+            self._summary(build_log_to_depth('log', self.records, 1), 10))
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# pylint: disable=protected-access,invalid-name
+from __future__ import absolute_import, unicode_literals, division
+
+import argparse
+import datetime
+import logging
+
+from pignacio_scripts.testing import TestCase
+
+from vld.utils import parse_date
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class ParseDateTests(TestCase):
+    def setUp(self):
+        self.today = datetime.date(2016, 3, 1)
+
+    def _parse(self, string):
+        return parse_date(string, today=self.today)
+
+    def test_iso(self):
+        self.assertEqual(self._parse('2015-06-02'), datetime.date(2015, 6, 2))
+
+    def test_relative(self):
+        self.assertEqual(self._parse('today'), self.today)
+        self.assertEqual(self._parse('Yesterday'), datetime.date(2016, 2, 29))
+        self.assertEqual(self._parse('7d'), datetime.date(2016, 2, 23))
+        self.assertEqual(self._parse('0d'), self.today)
+
+    def test_invalid(self):
+        for string in ['', 'tomorrow', '2015-13-01', '-7d', '7']:
+            with self.assertRaises(argparse.ArgumentTypeError):
+                self._parse(string)
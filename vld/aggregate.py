@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, division
+
+import collections
+import logging
+
+from pignacio_scripts.namedtuple import namedtuple_with_defaults
+
+from .objects import NutritionalValue
+
+try:
+    import numpy
+except ImportError:  # numpy is optional
+    numpy = None  # pylint: disable=invalid-name
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+AggregateRow = namedtuple_with_defaults(
+    'AggregateRow', ['ingredient', 'unit', 'amount', 'nutritional_value'])
+
+
+def iter_leaves(log):
+    # Yields the leaves of a LogData tree in order, without recursion
+    stack = [log]
+    while stack:
+        node = stack.pop()
+        if node.parts:
+            stack.extend(reversed(node.parts))
+        else:
+            yield node
+
+
+def _category(row):
+    try:
+        category = row.ingredient.categories[0]
+    except IndexError:
+        category = 'unknown'
+    return category.strip().lower()
+
+
+GROUP_KEYS = {
+    'ingredient': lambda row: row.ingredient.name,
+    'category': _category,
+    'unit': lambda row: row.unit,
+}
+
+
+class Aggregation(object):
+    # Folds log leaves into the total amount of every (ingredient, unit)
+    # pair. Leaves without an ingredient are kept apart in `unmatched`.
+    # Nutritional values are computed once per pair, and rows can then be
+    # grouped by any combination of GROUP_KEYS.
+    def __init__(self, ingredients, leaves=()):
+        self.ingredients = ingredients
+        self.amounts = collections.defaultdict(
+            lambda: collections.defaultdict(int))
+        self.unmatched = []
+        self._rows = {}
+        self.add_all(leaves)
+
+    def add(self, leaf):
+        log_line = leaf.log_line
+        if log_line and log_line.ingredient:
+            name = log_line.ingredient.name
+            self.amounts[name][log_line.unit] += log_line.amount
+            self._rows.pop(name, None)
+        else:
+            self.unmatched.append(leaf)
+
+    def add_all(self, leaves):
+        for leaf in leaves:
+            self.add(leaf)
+
+    def add_columns(self, columns):
+        # Same as add_all over the rows of a LogColumns, folding the amount
+        # of every (ingredient, unit) pair with a single column reduction
+        pairs, unmatched = _fold_amounts(columns)
+        for (ingredient_id, unit_id), amount in pairs:
+            name = columns.ingredients[ingredient_id].name
+            self.amounts[name][columns.units[unit_id]] += amount
+            self._rows.pop(name, None)
+        self.unmatched.extend(columns.leaf(row) for row in unmatched)
+
+    def rows(self, name):
+        # The AggregateRows of an ingredient, one per unit
+        try:
+            return self._rows[name]
+        except KeyError:
+            pass
+        ingredient = self.ingredients[name]
+        amounts = self.amounts[name]
+        units = list(amounts)
+        values = ingredient.get_nutritional_values(
+            [amounts[u] for u in units], units)
+        width = len(NutritionalValue._fields)
+        rows = []
+        for index, unit in enumerate(units):
+            if ingredient.has_unit(unit):
+                nut_value = NutritionalValue.from_row(
+                    values[index * width:(index + 1) * width])
+            else:
+                logger.warning("Cannot convert '%s' from '%s' to '%s'",
+                               ingredient.name, unit, ingredient.sample_unit)
+                nut_value = NutritionalValue.UNKNOWN
+            rows.append(AggregateRow(ingredient, unit, amounts[unit],
+                                     nut_value))
+        self._rows[name] = rows
+        return rows
+
+    def group(self, *keys):
+        # Returns {(key value, ...): [AggregateRow, ...]}, with one value
+        # per key in `keys`
+        key_funcs = [GROUP_KEYS[k] for k in keys]
+        groups = collections.defaultdict(list)
+        for name in self.amounts:
+            for row in self.rows(name):
+                groups[tuple(f(row) for f in key_funcs)].append(row)
+        return groups
+
+
+def _fold_amounts(columns):
+    # Returns the total amount of every (ingredient id, unit id) pair in
+    # `columns`, in order of first appearance, and the rows without an
+    # ingredient. Amounts are added in row order either way, so the totals
+    # match the ones Aggregation.add gets.
+    if numpy is not None and len(columns):
+        ingredient_ids = numpy.frombuffer(columns.ingredient_ids, dtype='l')
+        unit_ids = numpy.frombuffer(columns.unit_ids, dtype='l')
+        amounts = numpy.frombuffer(columns.amounts, dtype=float)
+        matched = ingredient_ids >= 0
+        keys = ingredient_ids[matched] * len(columns.units) + unit_ids[
+            matched]
+        totals = numpy.bincount(keys, weights=amounts[matched]).tolist()
+        keys, first = numpy.unique(keys, return_index=True)
+        pairs = [(divmod(k, len(columns.units)), totals[k])
+                 for k in keys[numpy.argsort(first)].tolist()]
+        return pairs, numpy.flatnonzero(~matched).tolist()
+
+    totals = collections.OrderedDict()
+    unmatched = []
+    for row, (ingredient_id, unit_id, amount) in enumerate(zip(
+            columns.ingredient_ids, columns.unit_ids, columns.amounts)):
+        if ingredient_id < 0:
+            unmatched.append(row)
+        else:
+            key = (ingredient_id, unit_id)
+            totals[key] = totals.get(key, 0) + amount
+    return list(totals.items()), unmatched
@@ -8,17 +8,16 @@ import os
 from pignacio_scripts.terminal.color import green, blue, red
 
 from vld.constants import DATA_DIR
-from vld.ingredient import IngredientMap
 from vld.objects import NutritionalValue, LogData
-from vld.serialization import load_ingredients
+from vld.serialization import load_ingredient_map
 from vld.parse import parse_log_data, ParseError
-from vld.utils import base_argument_parser
+from vld.utils import add_jobs_argument, base_argument_parser
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
 def get_argument_parser():
-    parser = base_argument_parser()
+    parser = add_jobs_argument(base_argument_parser())
     parser.add_argument(
         'data',
         nargs="+",
@@ -29,8 +28,9 @@ def get_argument_parser():
 
 def main(options):
     parts = " ".join(options.data).split("+")
-    ingredients = load_ingredients(os.path.join(DATA_DIR, 'ingredients'))
-    ingredient_map = IngredientMap(ingredients)
+    ingredient_map = load_ingredient_map(os.path.join(DATA_DIR,
+                                                      'ingredients'),
+                                         processes=options.jobs or None)
     datas = [make_log_data(p, ingredient_map, n) for n, p in enumerate(parts)]
 
     for data in datas:
@@ -57,6 +57,10 @@ def get_argument_parser():
                         action='append',
                         default=[],
                         help='Category for the new ingredient')
+    parser.add_argument('--alias',
+                        action='append',
+                        default=[],
+                        help='Another name for the new ingredient')
     return parser
 
 
@@ -73,5 +77,6 @@ def main(options):
                             sample_size=options.sample_size,
                             sample_unit=options.sample_unit,
                             sample_value=sample_value,
-                            categories=options.category)
+                            categories=options.category,
+                            aliases=options.alias)
     print json.dumps(ingredient.as_json(), indent=1)
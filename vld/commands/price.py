@@ -9,17 +9,16 @@ import re
 import os
 
 from vld.constants import DATA_DIR
-from vld.ingredient import IngredientMap
-from vld.serialization import load_ingredients
+from vld.serialization import load_ingredient_map
 from vld.parse import parse_log_data, ParseError
 from vld.objects import CantConvert, LogData, NutritionalValue
-from vld.utils import base_argument_parser
+from vld.utils import add_jobs_argument, base_argument_parser
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
 def get_argument_parser():
-    parser = base_argument_parser()
+    parser = add_jobs_argument(base_argument_parser())
     parser.add_argument(
         'data',
         nargs='+',
@@ -30,8 +29,9 @@ def get_argument_parser():
 
 def main(options):
     parts = ' '.join(options.data).split('+')
-    ingredients = load_ingredients(os.path.join(DATA_DIR, 'ingredients'))
-    ingredient_map = IngredientMap(ingredients)
+    ingredient_map = load_ingredient_map(os.path.join(DATA_DIR,
+                                                      'ingredients'),
+                                         processes=options.jobs or None)
     _update_stock(STOCK_DIR, STOCK_CACHE_DIR, ingredient_map)
     with open(os.path.join(STOCK_CACHE_DIR,
                            datetime.date.today().strftime('%F'))) as fin:
@@ -2,55 +2,169 @@
 from __future__ import absolute_import, unicode_literals, division
 
 import collections
+import functools
 import logging
 import os
+import sys
+import time
 
-from pignacio_scripts.terminal.color import (bright_blue, bright_cyan,
-                                             bright_green, bright_magenta,
-                                             bright_red, red)
-
-from ..constants import DATA_DIR
-from ..conversions import CantConvert
-from ..ingredient import IngredientMap
+from ..aggregate import Aggregation, iter_leaves
+from ..constants import DATA_DIR, LOG_INDEX_PATH, REPORT_CACHE_PATH
+from ..ingredient import IngredientMap, normalize_name_stats
+from ..logs import DatedLogIndex, LogFileCache, LogWatcher, walk_log_files
 from ..objects import NutritionalValue, LogData
-from ..parse import parse_log_data, ParseError
-from ..serialization import load_ingredients
-from ..utils import base_argument_parser, get_terminal_size
+from ..parse import parse_log_data_stats
+from ..process import (process_paths, process_paths_columns,
+                       update_log_tree)
+from ..render import print_log
+from ..serialization import load_ingredients, get_fingerprint
+from ..tree import LogTree
+from ..utils import (add_date_range_arguments, add_jobs_argument,
+                     base_argument_parser, get_terminal_size)
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
-_DEFAULT_FORMAT = (
-    '%(calories)s kCal (%(net_carbs)4s nc, %(protein)4s p, %(fat)4s f) '
-    '[%(fiber)4s df]')
-
-_DEFAULT_COLORS = [bright_green, bright_blue, bright_magenta, bright_cyan, red]
+_CLEAR_SCREEN = '\x1b[2J\x1b[H'
 
 
 def main(options):
-    ingredients = IngredientMap(load_ingredients(os.path.join(DATA_DIR,
-                                                              'ingredients')))
+    ingredients_dir = os.path.join(DATA_DIR, 'ingredients')
+    ingredients = IngredientMap(load_ingredients(
+        ingredients_dir,
+        processes=options.jobs or None))
+
+    # Grouped reports need every leaf, the others only what they show
+    grouped = options.by_ingredient or options.by_category
+    max_depth = None if grouped else options.depth
+
+    if uses_report_cache(options):
+        cache = LogFileCache(REPORT_CACHE_PATH,
+                             get_fingerprint(ingredients_dir))
+    else:
+        cache = None
+    if options.since or options.until:
+        index = DatedLogIndex(LOG_INDEX_PATH)
+        walk = functools.partial(index.walk,
+                                 since=options.since,
+                                 until=options.until)
+    else:
+        index = None
+        walk = walk_log_files
+
+    if options.watch:
+        watch_paths(options.file, ingredients, options, cache=cache,
+                    walk=walk)
+        if index is not None:
+            index.save()
+        return
+
+    if grouped:
+        # Grouped reports only aggregate the leaves, so they skip the tree
+        columns = process_paths_columns(options.file, ingredients,
+                                        jobs=options.jobs,
+                                        cache=cache,
+                                        walk=walk)
+    else:
+        parts = process_paths(options.file, ingredients,
+                              jobs=options.jobs,
+                              cache=cache,
+                              compact=options.compact,
+                              max_depth=max_depth,
+                              walk=walk)
+    if index is not None:
+        logger.info("Log index: %d directories listed", index.listed)
+        index.save()
+    if cache is not None:
+        logger.info("Log files: %d cached, %d parsed", cache.hits,
+                    cache.misses)
+        cache.save()
+    stats = parse_log_data_stats()
+    logger.info("Parsed log lines: %d cache hits, %d misses", stats.hits,
+                stats.misses)
+    stats = normalize_name_stats()
+    logger.info("Ingredient lookups: %d exact, %d cached, %d normalized",
+                ingredients.exact_hits, stats.hits, stats.misses)
+    if grouped:
+        if not len(columns):
+            print "The logs were empty :("
+            return
+        aggregation = Aggregation(ingredients)
+        aggregation.add_columns(columns)
+        print_grouped_report(aggregation, ingredients, options)
+    else:
+        print_report(parts, ingredients, options)
 
-    parts = [process_path(f, ingredients) for f in options.file]
+
+def uses_report_cache(options):
+    # Parsing a few days is cheaper than loading the cache of the whole log.
+    # The cache also keeps every parsed leaf in memory, which would undo
+    # --compact and reports that only show a few levels, unless --watch
+    # keeps every leaf anyway.
+    if options.no_cache or options.since or options.until:
+        return False
+    grouped = options.by_ingredient or options.by_category
+    saves_memory = options.compact or (options.depth is not None and
+                                       not grouped)
+    return options.watch or not saves_memory
+
+
+def print_report(parts, ingredients, options):
     parts = [p for p in parts if p]
-    log = LogData.from_parts('all', parts)
     if not parts:
         print "The logs were empty :("
         return
+    if options.by_ingredient or options.by_category:
+        log = LogData.from_parts('all', parts)
+        print_grouped_report(Aggregation(ingredients, iter_leaves(log)),
+                             ingredients, options)
+        return
+
     width = get_terminal_size()[0]
+    for log in parts:
+        print_log(log, max_levels=options.depth, width=width)
+
+
+def print_grouped_report(aggregation, ingredients, options):
+    # Both groupings come out of the same pass over the leaves
+    logs = []
     if options.by_ingredient:
-        logs = [group_by_ingredient(log, ingredients, sort_by=options.sort)]
-    elif options.by_category:
-        logs = [group_by_category(log, ingredients, sort_by=options.sort)]
-    else:
-        logs = parts
+        logs.append(group_by_ingredient(None, ingredients,
+                                        sort_by=options.sort,
+                                        aggregation=aggregation))
+    if options.by_category:
+        logs.append(group_by_category(None, ingredients,
+                                      sort_by=options.sort,
+                                      aggregation=aggregation))
 
+    width = get_terminal_size()[0]
     for log in logs:
         print_log(log, max_levels=options.depth, width=width)
 
 
 def get_argument_parser():
-    parser = base_argument_parser()
+    parser = add_jobs_argument(base_argument_parser())
     parser.add_argument('file', help='file/directory to process', nargs='+')
+    add_date_range_arguments(parser)
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        default=False,
+        help='Parse every log file, ignoring the report cache.')
+    parser.add_argument(
+        '--compact',
+        action='store_true',
+        default=False,
+        help=('Keep the parsed logs in compact arrays. Slower, but uses '
+              'much less memory on very large histories.'))
+    parser.add_argument(
+        '-w', '--watch',
+        action='store_true',
+        default=False,
+        help='Keep running, updating the report when the logs change.')
+    parser.add_argument('--interval',
+                        default=1.0,
+                        type=float,
+                        help='Seconds between log polls in --watch mode.')
     parser.add_argument('-d', '--depth',
                         default=None,
                         type=int,
@@ -75,151 +189,36 @@ def get_argument_parser():
     return parser
 
 
-def _log_values(nut_value):
-    return {
-        f: "???" if v is None else "{:.1f}".format(v)
-        for f, v in nut_value.values().items()
-    }
-
-
-# pylint: disable=too-many-arguments,redefined-builtin
-def print_log(log,
-              format=_DEFAULT_FORMAT,
-              level=0,
-              width=100,
-              colors=None,
-              max_levels=None):
-    colors = colors or _DEFAULT_COLORS
-    right_part = format % _log_values(log.nutritional_value)
-    left_part = '{}{}:'.format(' ' * level, log.name)
-    right_size = max(0, width - len(left_part) - 2)
-    format_str = '{}{:>' + str(right_size) + '}'
-
-    try:
-        color = colors[level]
-    except IndexError:
-        color = lambda s: s
-
-    incomplete_marker = bright_red("!") if log.incomplete else " "
-    unknown_marker = bright_red("*") if "???" in right_part else " "
-
-    print(color(format_str.format(left_part, right_part)) + unknown_marker +
-          incomplete_marker)
-
-    if log.parts and (max_levels is None or level < max_levels):
-        for part in log.parts:
-            print_log(part, format, level + 1,
-                      colors=colors,
-                      max_levels=max_levels,
-                      width=width)
-        print
-
-
-def process_log(name, log, ingredients):
-    if '__init__' in log:
-        init_parts = process_log_leaf(log['__init__'], ingredients)
-    else:
-        init_parts = []
-
-    parts = [process_log(n, sublog, ingredients)
-             for n, sublog in sorted(log.items()) if n != '__init__']
-    parts.extend(init_parts)
-
-    parts = [p for p in parts if p]
-
-    #    if not parts:
-    #        return None
-
-    return LogData.from_parts(name, parts)
-
-
-def process_log_leaf(log_leaf, ingredients):
-    lines = (l for l in log_leaf
-             if l.strip() and not l.strip().startswith('#'))
-
-    return [make_log_data(l, ingredients)._replace(is_leaf=True)
-            for ln, l in enumerate(lines)]
-
-
-def process_path(path, ingredients):
-    log = path_to_log(path)
-    processed = process_log(os.path.basename(path.rstrip('/')), log,
-                            ingredients)
-    return processed
-
-
-def path_to_log(path):
-    path = path.rstrip("/")
-    if os.path.isfile(path):
-        with open(path) as fin:
-            lines = fin.readlines()
-        if os.path.basename(path) == '__init__':
-            return lines
-        return {'__init__': lines}
-    else:
-        return {
-            l: path_to_log(os.path.join(path, l))
-            for l in os.listdir(path)
-        }
-
-
-def make_log_data(line, ingredients):
+def watch_paths(paths, ingredients, options, cache=None,
+                walk=walk_log_files):
+    # Keeps a LogTree per path, updated with the files that changed since
+    # the previous poll, and redraws the report whenever one of them changes
+    watched = [(LogWatcher(p, walk=walk),
+                LogTree(os.path.basename(p.rstrip('/')))) for p in paths]
     try:
-        return parse_log_data(line, ingredients)
-    except ParseError as err:
-        return LogData(name=line.split("#", 1)[0].strip(),
-                       nutritional_value=NutritionalValue.UNKNOWN,
-                       incomplete=True)
-
-
-def extract_leaf_log_datas(log):
-    lines = []
-    if not log.parts:
-        lines.append(log)
-    for part in log.parts:
-        lines.extend(extract_leaf_log_datas(part))
-    return lines
-
-
-def group_by_ingredient(log, ingredients, sort_by=None):
-    leafs = extract_leaf_log_datas(log)
-
-    grouped = collections.defaultdict(lambda: collections.defaultdict(int))
-    no_ingredient = []
-
-    for log_data in leafs:
-        log_line = log_data.log_line
-        if log_line and log_line.ingredient:
-            grouped[log_line.ingredient.name][log_line.unit] += log_line.amount
-        else:
-            no_ingredient.append(log_data)
-
-    log_datas = []
-
-    for ingredient_name, amounts in grouped.items():
-        ingredient = ingredients[ingredient_name]
-        parts = []
-        for unit, amount in amounts.items():
-            try:
-                nut_value = ingredient.get_nutritional_value(amount, unit)
-            except CantConvert as err:
-                logger.warning(str(err))
-                nut_value = NutritionalValue.UNKNOWN
-            parts.append(LogData(
-                name="{} ({} {})".format(ingredient.name, amount, unit),
-                nutritional_value=nut_value))
-        parts.sort(key=lambda x: x.nutritional_value.calories, reverse=True)
-
-        if len(parts) == 1:
-            log_datas.append(parts[0]._replace(ingredient=ingredient))
-        else:
-            name = "{} ({})".format(ingredient.name,
-                                    " + ".join("{:.2f} {}".format(v, k)
-                                               for k, v in amounts.items()))
-            log_datas.append(LogData.from_parts(name, parts,
-                                                ingredient=ingredient))
-
-    log_datas.extend(no_ingredient)
+        while True:
+            changed = [update_log_tree(tree, watcher, ingredients, cache)
+                       for watcher, tree in watched]
+            if any(changed):
+                sys.stdout.write(_CLEAR_SCREEN)
+                print_report([t.log_data() for _w, t in watched],
+                             ingredients, options)
+                sys.stdout.flush()
+            time.sleep(options.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if cache is not None:
+            cache.save()
+
+
+def group_by_ingredient(log, ingredients, sort_by=None, aggregation=None):
+    if aggregation is None:
+        aggregation = Aggregation(ingredients, iter_leaves(log))
+
+    log_datas = [_ingredient_log_data(name, rows)
+                 for (name, ), rows in aggregation.group('ingredient').items()]
+    log_datas.extend(aggregation.unmatched)
 
     sort_by = sort_by or 'calories'
     log_datas.sort(key=lambda x: getattr(x.nutritional_value, sort_by),
@@ -228,23 +227,41 @@ def group_by_ingredient(log, ingredients, sort_by=None):
     return LogData.from_parts('By ingredient', log_datas)
 
 
-def group_by_category(log, ingredients, sort_by=None):
-    by_ingredient = group_by_ingredient(log, ingredients)
-    by_category = collections.defaultdict(list)
-
-    for part in by_ingredient.parts:
-        try:
-            category = part.ingredient.categories[0]
-        except (IndexError, AttributeError):
-            category = 'unknown'
+def group_by_category(log, ingredients, sort_by=None, aggregation=None):
+    if aggregation is None:
+        aggregation = Aggregation(ingredients, iter_leaves(log))
 
-        by_category[category.strip().lower()].append(part)
-
-    categories = [LogData.from_parts(category.capitalize(), parts)
-                  for category, parts in by_category.items()]
+    by_category = collections.defaultdict(list)
+    for (category, name), rows in aggregation.group('category',
+                                                    'ingredient').items():
+        by_category[category].append(_ingredient_log_data(name, rows))
+    if aggregation.unmatched:
+        by_category['unknown'].extend(aggregation.unmatched)
+
+    categories = []
+    for category, parts in by_category.items():
+        parts.sort(key=lambda x: x.nutritional_value.calories, reverse=True)
+        categories.append(LogData.from_parts(category.capitalize(), parts))
 
     sort_by = sort_by or 'calories'
     categories.sort(key=lambda x: getattr(x.nutritional_value, sort_by),
                     reverse=True)
 
     return LogData.from_parts('By categories', categories)
+
+
+def _ingredient_log_data(name, rows):
+    # The part of an ingredient in a grouped report, with one part per unit
+    # when it was logged in several
+    parts = [LogData(name="{} ({} {})".format(name, row.amount, row.unit),
+                     nutritional_value=row.nutritional_value)
+             for row in rows]
+    parts.sort(key=lambda x: x.nutritional_value.calories, reverse=True)
+
+    ingredient = rows[0].ingredient
+    if len(parts) == 1:
+        return parts[0]._replace(ingredient=ingredient)
+    name = "{} ({})".format(name, " + ".join("{:.2f} {}".format(r.amount,
+                                                                r.unit)
+                                             for r in rows))
+    return LogData.from_parts(name, parts, ingredient=ingredient)
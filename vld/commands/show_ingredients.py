@@ -11,13 +11,13 @@ from pignacio_scripts.terminal.color import green, blue, red
 from vld.constants import DATA_DIR
 from vld.objects import NutritionalValue, CantConvert
 from vld.serialization import load_ingredients
-from vld.utils import base_argument_parser
+from vld.utils import add_jobs_argument, base_argument_parser
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
 def get_argument_parser():
-    parser = base_argument_parser()
+    parser = add_jobs_argument(base_argument_parser())
     parser.add_argument(
         '-s', '--sort',
         action='store',
@@ -58,7 +58,8 @@ def _filter_by_category(ingredients, category):
             if any(category == _norm(c) for c in i.categories)]
 
 def main(options):
-    ingredients = load_ingredients(os.path.join(DATA_DIR, 'ingredients'))
+    ingredients = load_ingredients(os.path.join(DATA_DIR, 'ingredients'),
+                                   processes=options.jobs or None)
     if options.category:
         ingredients = _filter_by_category(ingredients, options.category)
     if not ingredients:
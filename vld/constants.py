@@ -3,10 +3,13 @@
 from __future__ import absolute_import, unicode_literals, division
 
 import logging
+import os
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 DATA_DIR = 'data'
+REPORT_CACHE_PATH = os.path.join(DATA_DIR, 'report.cache')
+LOG_INDEX_PATH = os.path.join(DATA_DIR, 'log.index')
 
 DEFAULT_CONVERSIONS = {
     'kg': {'g': 1000},
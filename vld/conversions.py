@@ -6,7 +6,9 @@ import collections
 import itertools
 import logging
 
-__all__ = ['get_conversion_table']
+from .utils import LRUCache
+
+__all__ = ['get_conversion_table', 'get_conversion_lookup']
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -23,6 +25,16 @@ class Conversions(object):
     def __init__(self):
         self._parents = {}
         self._factors = collections.defaultdict(dict)
+        # Roots whose factors dict is not shared with another Conversions
+        self._owned = set()
+
+    def copy(self):
+        # Factor dicts are shared with the copy until either side writes them
+        clone = Conversions()
+        clone._parents = dict(self._parents)
+        clone._factors = collections.defaultdict(dict, self._factors)
+        self._owned.clear()
+        return clone
 
     def _see(self, unit):
         if unit in self._parents:
@@ -30,6 +42,9 @@ class Conversions(object):
         self._put(unit, unit, 1.0)
 
     def _put(self, source, dest, factor):
+        if source not in self._owned:
+            self._factors[source] = dict(self._factors[source])
+            self._owned.add(source)
         self._parents[dest] = source
         self._factors[source][dest] = factor
 
@@ -66,22 +81,62 @@ class Conversions(object):
             self._steal(source_parent, dest_parent, parent_factor)
 
     def get_conversion_table(self):
-        table = collections.defaultdict(dict)
+        table = {}
 
         for factors in self._factors.values():
+            for source in factors:
+                table[source] = {}
             for source, dest in itertools.product(factors, factors):
                 table[source][dest] = factors[dest] / factors[source]
 
         return table
 
 
+class ConversionLookup(object):
+    # Keeps, for every unit, its component root and the amount of the unit
+    # in one root unit. Memory is linear in the number of units, and factors
+    # are computed on demand.
+    def __init__(self, conversions):
+        self._components = dict(conversions._factors)
+        self._roots = {
+            unit: root
+            for root, factors in self._components.items()
+            for unit in factors
+        }
+
+    def __contains__(self, unit):
+        return unit in self._roots
+
+    def convertible(self, source, dest):
+        root = self._roots.get(source)
+        return root is not None and root == self._roots.get(dest)
+
+    def factor(self, source, dest):
+        if not self.convertible(source, dest):
+            raise CantConvert("Cannot convert from '{}' to '{}'".format(
+                source, dest))
+        factors = self._components[self._roots[source]]
+        return factors[dest] / factors[source]
+
+    def units(self, unit):
+        try:
+            factors = self._components[self._roots[unit]]
+        except KeyError:
+            return {}
+        return {u: factors[unit] / f for u, f in factors.items()}
+
+
 def _iter_conversions(conversions):
     for source, factors in conversions.items():
         for dest, factor in factors.items():
             yield source, dest, factor
 
 
-def get_conversion_table(ingredient_conversions, default_conversions):
+def _conversions_key(conversions):
+    return tuple(sorted(_iter_conversions(conversions)))
+
+
+def _build_conversions(ingredient_conversions, default_conversions):
     conversions = Conversions()
     for source, dest, factor in _iter_conversions(ingredient_conversions):
         conversions.add(source, dest, factor)
@@ -91,4 +146,45 @@ def get_conversion_table(ingredient_conversions, default_conversions):
             conversions.add(source, dest, factor)
         except DuplicateConversion:
             pass
-    return conversions.get_conversion_table()
+    return conversions
+
+
+_BASES = LRUCache(maxsize=16)
+
+
+def _get_base(default_conversions, default_key):
+    return _BASES.get(default_key,
+                      lambda: _build_conversions({}, default_conversions))
+
+
+def _ingredient_conversions(ingredient_conversions, default_conversions,
+                            default_key):
+    conversions = _get_base(default_conversions, default_key).copy()
+    try:
+        for source, dest, factor in _iter_conversions(ingredient_conversions):
+            conversions.add(source, dest, factor)
+    except DuplicateConversion:
+        # Ingredient conversions take precedence over the default ones, so
+        # conflicting ingredients are built without the shared base
+        return _build_conversions(ingredient_conversions, default_conversions)
+    return conversions
+
+
+def get_conversion_table(ingredient_conversions, default_conversions):
+    # Public API, for callers that want every factor at once. The table is
+    # quadratic in the units of a component, so it is not cached, and
+    # ingredients use get_conversion_lookup instead.
+    default_key = _conversions_key(default_conversions)
+    return _ingredient_conversions(ingredient_conversions,
+                                   default_conversions,
+                                   default_key).get_conversion_table()
+
+
+_LOOKUPS = LRUCache(maxsize=4096)
+
+
+def get_conversion_lookup(ingredient_conversions, default_conversions):
+    default_key = _conversions_key(default_conversions)
+    key = (_conversions_key(ingredient_conversions), default_key)
+    return _LOOKUPS.get(key, lambda: ConversionLookup(_ingredient_conversions(
+        ingredient_conversions, default_conversions, default_key)))
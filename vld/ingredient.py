@@ -2,22 +2,164 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals, division
 
+import itertools
 import logging
+
+from cached_property import cached_property
 from unidecode import unidecode
 
+from .suggestions import NameIndex
+from .utils import CacheStats
+
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
+_VERSIONS = itertools.count(1)
+
+
+class _NameNormalizer(object):
+    # A plain dict, cleared when full, is cheaper than LRU bookkeeping for
+    # such a fast function
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._names = {}
+
+    def __call__(self, name):
+        try:
+            normalized = self._names[name]
+        except KeyError:
+            self.misses += 1
+            if len(self._names) >= self.maxsize:
+                self._names.clear()
+            normalized = unidecode(name.strip()).lower()
+            self._names[name] = normalized
+        else:
+            self.hits += 1
+        return normalized
+
+    def stats(self):
+        return CacheStats(hits=self.hits,
+                          misses=self.misses,
+                          size=len(self._names),
+                          maxsize=self.maxsize)
+
+
+normalize_name = _NameNormalizer(maxsize=65536)  # pylint: disable=invalid-name
+
+
+def normalize_name_stats():
+    return normalize_name.stats()
+
+
 class IngredientMap(object):
     def __init__(self, ingredients):
+        ingredients = list(ingredients)
         self._ingredients = {
             self._normalize_name(i.name): i
             for i in ingredients
         }
+        # Aliases point to the key of their ingredient, so every name shares
+        # one instance (and its cached conversions)
+        self._aliases = {
+            self._normalize_name(alias): self._normalize_name(i.name)
+            for i in ingredients for alias in i.aliases
+        }
+        # Identifies this set of ingredients in caches of derived data
+        self.version = next(_VERSIONS)
+        self.exact_hits = 0
 
     def __getitem__(self, name):
-        return self._ingredients[self._normalize_name(name)]
+        # Normalizing is idempotent, so names that already are a key skip it
+        try:
+            ingredient = self._ingredients[name]
+        except KeyError:
+            return self._get(self._normalize_name(name))
+        self.exact_hits += 1
+        return ingredient
+
+    def __iter__(self):
+        return iter(self._ingredients.values())
+
+    def __len__(self):
+        return len(self._ingredients)
+
+    def units(self):
+        units = set()
+        for ingredient in self:
+            units.update(ingredient.units())
+        return units
+
+    def _keys(self):
+        return list(self._ingredients) + list(self._aliases)
+
+    def _get(self, key):
+        try:
+            return self._ingredients[key]
+        except KeyError:
+            return self._ingredients[self._aliases[key]]
+
+    @cached_property
+    def _name_index(self):
+        return NameIndex(self._keys())
+
+    def _names(self, keys):
+        names = []
+        for key in keys:
+            name = self._get(key).name
+            if name not in names:
+                names.append(name)
+        return names
+
+    def suggest(self, name, limit=3):
+        return self._names(self._name_index.closest(
+            self._normalize_name(name), limit))
+
+    def with_prefix(self, prefix, limit=None):
+        return self._names(self._name_index.with_prefix(
+            self._normalize_name(prefix), limit))
+
+    _normalize_name = staticmethod(normalize_name)
+
+
+class LazyIngredientMap(IngredientMap):
+    # Ingredients are loaded on first access through `load`, which receives
+    # the location stored for their normalized name in `index`
+    def __init__(self, index, load, units, aliases=None):
+        # pylint: disable=super-init-not-called
+        self._index = index
+        self._aliases = aliases or {}
+        self._load = load
+        self._units = set(units)
+        self._ingredients = {}
+        self.version = next(_VERSIONS)
+        self.exact_hits = 0
+
+    def _get(self, key):
+        if key not in self._index:
+            key = self._aliases[key]
+        try:
+            return self._ingredients[key]
+        except KeyError:
+            ingredient = self._load(self._index[key])
+            self._ingredients[key] = ingredient
+            return ingredient
+
+    def __getitem__(self, name):
+        if name in self._index:
+            self.exact_hits += 1
+            return self._get(name)
+        return self._get(self._normalize_name(name))
+
+    def __iter__(self):
+        return (self._get(key) for key in self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def units(self):
+        return set(self._units)
 
-    @staticmethod
-    def _normalize_name(name):
-        return unidecode(name.strip()).lower()
+    def _keys(self):
+        return list(self._index) + list(self._aliases)
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, division
+
+import calendar
+import datetime
+import logging
+import os
+import sys
+
+try:
+    from os import scandir
+except ImportError:  # Python < 3.5
+    scandir = None  # pylint: disable=invalid-name
+
+try:
+    import cPickle as pickle
+except ImportError:  # Python 3
+    import pickle
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+INIT_FILENAME = '__init__'
+_CACHE_VERSION = 2
+_INDEX_VERSION = 1
+
+
+def _list_dir(path):
+    # Returns sorted (name, path, is_dir) for every entry in the directory
+    if scandir is not None:
+        entries = [(e.name, e.path, e.is_dir()) for e in scandir(path)]
+    else:
+        entries = [(n, os.path.join(path, n),
+                    os.path.isdir(os.path.join(path, n)))
+                   for n in os.listdir(path)]
+    entries.sort()
+    return entries
+
+
+def walk_log_files(path, components=()):
+    # Yields (components, filename) records for a log file or directory,
+    # where `components` names the node relative to `path`. Every node is
+    # announced with a None filename first, so empty ones still show up.
+    # Children come in name order, followed by the directory's own __init__
+    # file, whose lines belong to the directory node.
+    path = path.rstrip('/')
+    yield components, None
+    if not os.path.isdir(path):
+        yield components, path
+        return
+
+    init_path = None
+    for name, entry_path, is_dir in _list_dir(path):
+        if name == INIT_FILENAME and not is_dir:
+            init_path = entry_path
+            continue
+        for record in walk_log_files(entry_path, components + (name, )):
+            yield record
+    if init_path is not None:
+        yield components, init_path
+
+
+def walk_log(path):
+    # Same as walk_log_files, but yields the (components, line) records of
+    # every file, reading them lazily
+    for components, filename in walk_log_files(path):
+        if filename is None:
+            yield components, None
+            continue
+        with open(filename) as fin:
+            for line in fin:
+                yield components, line
+
+
+class LogFileCache(object):
+    # Persistent values computed from log files, valid while the file's
+    # mtime and size and the cache `key` do not change. `key` should
+    # fingerprint everything else the values depend on.
+    def __init__(self, path, key):
+        self.path = path
+        self.key = (_CACHE_VERSION, sys.version_info[0], key)
+        self.hits = 0
+        self.misses = 0
+        self._entries = self._read()
+        self._signatures = {}
+        self._dirty = False
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as fin:
+                key, entries = pickle.load(fin)
+        except Exception:  # pylint: disable=broad-except
+            logger.debug("Could not read log cache '%s'", self.path,
+                         exc_info=True)
+            return {}
+        if key != self.key:
+            logger.info("Log cache '%s' is stale", self.path)
+            return {}
+        return entries
+
+    def fresh(self, filename):
+        stat = os.stat(filename)
+        signature = (stat.st_mtime, stat.st_size)
+        self._signatures[filename] = signature
+        entry = self._entries.get(os.path.abspath(filename))
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def get(self, filename):
+        return self._entries[os.path.abspath(filename)][1]
+
+    def put(self, filename, value):
+        signature = self._signatures.get(filename)
+        if signature is None:
+            stat = os.stat(filename)
+            signature = (stat.st_mtime, stat.st_size)
+        self._entries[os.path.abspath(filename)] = (signature, value)
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        self._entries = {f: e for f, e in self._entries.items()
+                         if os.path.exists(f)}
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as fout:
+                pickle.dump((self.key, self._entries), fout,
+                            pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError, pickle.PicklingError):
+            logger.warning("Could not write log cache '%s'", self.path,
+                           exc_info=True)
+        self._dirty = False
+
+
+class LogWatcher(object):
+    # Polls the log files under `path`. Every poll returns the nodes whose
+    # file changed since the previous one, as (components, filename)
+    # records, and the components of the nodes that went away. The first
+    # poll reports every node. `walk` lists the files, like walk_log_files.
+    def __init__(self, path, walk=walk_log_files):
+        self.path = path
+        self.walk = walk
+        self._signatures = {}
+
+    def _scan(self):
+        signatures = {}
+        for components, filename in self.walk(self.path):
+            if filename is None:
+                signatures[components] = (None, None)
+                continue
+            try:
+                stat = os.stat(filename)
+            except OSError:  # Removed while walking
+                continue
+            signatures[components] = (filename,
+                                      (stat.st_mtime, stat.st_size))
+        return signatures
+
+    def poll(self):
+        signatures = self._scan()
+        changed = [(c, s[0]) for c, s in signatures.items()
+                   if self._signatures.get(c) != s]
+        removed = [c for c in self._signatures if c not in signatures]
+        self._signatures = signatures
+        # Parents before their children
+        changed.sort(key=lambda r: r[0])
+        removed.sort(key=len)
+        return changed, removed
+
+
+def date_span(components):
+    # The (first, last) days covered by a YYYY/MM/DD log node, or None if
+    # its components are not a date. Anything below a day is in that day.
+    try:
+        parts = [int(c) for c in components[:3]]
+        if not parts:
+            return None
+        year = parts[0]
+        if len(parts) == 1:
+            return datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+        month = parts[1]
+        if len(parts) == 2:
+            last_day = calendar.monthrange(year, month)[1]
+            return (datetime.date(year, month, 1),
+                    datetime.date(year, month, last_day))
+        day = datetime.date(year, month, parts[2])
+        return day, day
+    except ValueError:
+        return None
+
+
+def _date_prefix(path):
+    # Date components of the path itself, for walks that start below the
+    # root of the log, like log/2015/06
+    prefix = []
+    head = os.path.abspath(path)
+    while len(prefix) < 3:
+        head, name = os.path.split(head)
+        if not name.isdigit():
+            break
+        prefix.insert(0, name)
+    while prefix and len(prefix[0]) != 4:
+        prefix.pop(0)
+    return tuple(prefix)
+
+
+class DatedLogIndex(object):
+    # Walks the days of a log organized in YYYY/MM/DD directories. Only the
+    # directories of the requested days are looked at, and their listings
+    # are persisted in `path`, valid while the directory's mtime does not
+    # change.
+    def __init__(self, path):
+        self.path = path
+        self.listed = 0
+        self._listings = self._read()
+        self._dirty = False
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as fin:
+                key, listings = pickle.load(fin)
+        except Exception:  # pylint: disable=broad-except
+            logger.debug("Could not read log index '%s'", self.path,
+                         exc_info=True)
+            return {}
+        if key != (_INDEX_VERSION, sys.version_info[0]):
+            logger.info("Log index '%s' is stale", self.path)
+            return {}
+        return listings
+
+    def _list_dir(self, path):
+        key = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime
+        listing = self._listings.get(key)
+        if listing is None or listing[0] != mtime:
+            self.listed += 1
+            listing = (mtime, [(n, d) for n, _p, d in _list_dir(path)])
+            self._listings[key] = listing
+            self._dirty = True
+        return listing[1]
+
+    def walk(self, path, since=None, until=None):
+        # Same records as walk_log_files, for the nodes dated between
+        # `since` and `until`. Nodes that are not dates are left out, and
+        # __init__ files only count if their whole node is in range.
+        path = path.rstrip('/')
+        since = since or datetime.date.min
+        until = until or datetime.date.max
+        prefix = _date_prefix(path)
+        if not os.path.isdir(path):
+            span = date_span(prefix)
+            if span is not None and span[0] <= until and span[1] >= since:
+                yield (), None
+                yield (), path
+            return
+        for record in self._walk(path, (), prefix, since, until):
+            yield record
+
+    def _walk(self, path, components, prefix, since, until):
+        yield components, None
+        init_path = None
+        for name, is_dir in self._list_dir(path):
+            entry_path = os.path.join(path, name)
+            if name == INIT_FILENAME and not is_dir:
+                init_path = entry_path
+                continue
+            child = components + (name, )
+            span = date_span(prefix + child)
+            if span is None or span[0] > until or span[1] < since:
+                continue
+            if is_dir:
+                for record in self._walk(entry_path, child, prefix, since,
+                                         until):
+                    yield record
+            else:
+                yield child, None
+                yield child, entry_path
+
+        span = date_span(prefix + components)
+        if (init_path is not None and span is not None and
+                span[0] >= since and span[1] <= until):
+            yield components, init_path
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            with open(tmp_path, 'wb') as fout:
+                pickle.dump(((_INDEX_VERSION, sys.version_info[0]),
+                             self._listings), fout, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError, pickle.PicklingError):
+            logger.warning("Could not write log index '%s'", self.path,
+                           exc_info=True)
+        self._dirty = False
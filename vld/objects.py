@@ -2,14 +2,21 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals, division
 
+import array
 import logging
+import math
 import re
 
 from cached_property import cached_property
 from pignacio_scripts.namedtuple import namedtuple_with_defaults
 
 from .constants import DEFAULT_CONVERSIONS
-from .conversions import get_conversion_table, CantConvert
+from .conversions import get_conversion_lookup, CantConvert
+
+try:
+    import numpy
+except ImportError:  # numpy is optional
+    numpy = None  # pylint: disable=invalid-name
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -23,6 +30,7 @@ _LogData = namedtuple_with_defaults(
         'incomplete',
         'ingredient',
         'is_leaf',
+        'unknown_fields',
     ],
     defaults=lambda: {
         'parts': [],
@@ -30,6 +38,7 @@ _LogData = namedtuple_with_defaults(
         'incomplete': False,
         'ingredient': None,
         'is_leaf': False,
+        'unknown_fields': (),
     }
 )  # yapf: disable
 
@@ -39,16 +48,35 @@ class LogData(_LogData):
 
     @classmethod
     def from_parts(cls, name, parts, **kwargs):
+        # `unknown_fields` are the fields where some value summed into the
+        # total, at any level below, was unknown and counted as 0
+        nut_value, unknown = NutritionalValue.sum_with_unknowns(
+            p.nutritional_value for p in parts)
+        if any(p.unknown_fields for p in parts):
+            unknown = set(unknown)
+            for part in parts:
+                unknown.update(part.unknown_fields)
+            unknown = tuple(f for f in NutritionalValue._fields
+                            if f in unknown)
         return cls(name=name,
                    parts=parts,
-                   nutritional_value=NutritionalValue.sum(p.nutritional_value
-                                                          for p in parts),
-                   incomplete=any(p.incomplete for p in parts), **kwargs)
+                   nutritional_value=nut_value,
+                   incomplete=any(p.incomplete for p in parts),
+                   unknown_fields=unknown, **kwargs)
+
+
+_LogLine = namedtuple_with_defaults('LogLine', ['name', 'amount', 'unit',
+                                                'ingredient'],
+                                    defaults={'ingredient': None})
+
+
+# A module level class, so log lines can be pickled on Python 3 too
+class LogLine(_LogLine):
+    __slots__ = ()
 
 
-LogLine = namedtuple_with_defaults('LogLine', ['name', 'amount', 'unit',
-                                               'ingredient'],
-                                   defaults={'ingredient': None})
+_NAN = float('nan')
+
 
 _NUTRITIONAL_VALUE_FIELDS = [
     'calories',
@@ -98,14 +126,56 @@ class NutritionalValue(_NutritionalValue):
     def from_json(cls, jobj):
         return cls(**jobj)
 
+    def as_row(self):
+        return [_NAN if v is None else v for v in self]
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*[None if math.isnan(v) else v for v in row])
+
     @classmethod
     def sum(cls, values):
-        values_sum = [0] * len(cls._fields)
-        for n_value in values:
-            for index, value in enumerate(n_value):
-                if value is not None:
-                    values_sum[index] += value
-        return cls(*values_sum)
+        return cls.sum_with_unknowns(values)[0]
+
+    @classmethod
+    def sum_with_unknowns(cls, values):
+        # Sums field by field, counting unknown values as 0. Returns the sum
+        # and the names of the fields where some value was unknown.
+        sums, unknown = [], []
+        for column in list(zip(*values)) or [()] * len(cls._fields):
+            known = [v for v in column if v is not None]
+            sums.append(sum(known))
+            unknown.append(len(known) != len(column))
+        return cls(*sums), tuple(f for f, u in zip(cls._fields, unknown) if u)
+
+    @classmethod
+    def sum_rows(cls, matrix, start=0, stop=None):
+        # Same as sum_with_unknowns, for the rows [start, stop) of a
+        # row-major array of doubles built with as_row, where NaN marks the
+        # unknown values. The rows are reduced with numpy when it is
+        # installed.
+        width = len(cls._fields)
+        if stop is None:
+            stop = len(matrix) // width
+        if numpy is not None:
+            block = numpy.frombuffer(matrix, dtype=float)[
+                start * width:stop * width].reshape(-1, width)
+            # A product with ones is much faster than sum(axis=0), and the
+            # NaN it leaves marks the columns that need the masked pass
+            ones = numpy.ones(len(block))
+            sums = ones.dot(block)
+            unknown = numpy.isnan(sums)
+            if unknown.any():
+                sums = ones.dot(numpy.where(numpy.isnan(block), 0., block))
+            sums, unknown = sums.tolist(), unknown.tolist()
+        else:
+            sums, unknown = [], []
+            for field in range(width):
+                column = matrix[start * width + field:stop * width:width]
+                known = [v for v in column if not math.isnan(v)]
+                sums.append(sum(known))
+                unknown.append(len(known) != len(column))
+        return cls(*sums), tuple(f for f, u in zip(cls._fields, unknown) if u)
 
     @classmethod
     def from_line(cls, line):
@@ -144,19 +214,17 @@ _Ingredient = namedtuple_with_defaults(
         'sample_unit',
         'conversions',
         'categories',
+        'aliases',
     ],
     defaults={
         'conversions': {},
         'categories': [],
+        'aliases': [],
     }
 )  # yapf: disable
 
 
 class Ingredient(_Ingredient):
-    def __init__(self, *args, **kwargs):
-        super(Ingredient, self).__init__(*args, **kwargs)
-        self.__conversion_table = None
-
     @classmethod
     def from_json(cls, jobj):
         jobj['sample_value'] = NutritionalValue.from_json(jobj['sample_value'])
@@ -168,22 +236,46 @@ class Ingredient(_Ingredient):
         return res
 
     @cached_property
-    def _conversion_table(self):
-        return get_conversion_table(self.conversions, DEFAULT_CONVERSIONS)
+    def _conversions(self):
+        return get_conversion_lookup(self.conversions, DEFAULT_CONVERSIONS)
 
     def convert(self, amount, unit, target_unit):
         if unit == target_unit:
             return amount
         else:
             try:
-                factor = self._conversion_table[unit][target_unit]
-            except KeyError:
+                factor = self._conversions.factor(unit, target_unit)
+            except CantConvert:
                 raise CantConvert(
                     "Cannot convert '{}' from '{}' to '{}'".format(
                         self.name, unit, target_unit))
 
         return amount * factor
 
+    def convert_many(self, amounts, units, target_unit):
+        # Amounts that cannot be converted come out as NaN
+        factors = {}
+        converted = array.array(str('d'))
+        for amount, unit in zip(amounts, units):
+            try:
+                factor = factors[unit]
+            except KeyError:
+                try:
+                    factor = self.convert(1, unit, target_unit)
+                except CantConvert:
+                    factor = _NAN
+                factors[unit] = factor
+            converted.append(amount * factor)
+        return converted
+
+    def get_nutritional_values(self, amounts, units):
+        # Row-major matrix with one row of NutritionalValue fields per amount
+        sample = [v / self.sample_size for v in self.sample_value.as_row()]
+        matrix = array.array(str('d'))
+        for amount in self.convert_many(amounts, units, self.sample_unit):
+            matrix.extend([amount * v for v in sample])
+        return matrix
+
     def get_nutritional_value(self, amount, unit):
         factor = self.convert(amount, unit,
                               self.sample_unit) / self.sample_size
@@ -196,6 +288,88 @@ class Ingredient(_Ingredient):
 
     def valid_units(self, base_unit=None):
         base_unit = base_unit or self.sample_unit
-        res = self._conversion_table.get(base_unit, {})
+        res = self._conversions.units(base_unit)
         res[base_unit] = 1
-        return {k: 1/v for k, v in res.items()}
+        return res
+
+    def has_unit(self, unit):
+        return (unit == self.sample_unit or
+                self._conversions.convertible(unit, self.sample_unit))
+
+    def units(self):
+        units = {self.sample_unit}
+        for conversions in [self.conversions, DEFAULT_CONVERSIONS]:
+            for source, factors in conversions.items():
+                units.add(source)
+                units.update(factors)
+        return units
+
+
+# Columnar storage for many parsed log lines. Ingredients and units are
+# interned, and their id columns hold -1 when unknown. The nutrient matrix is
+# row-major, NUTRIENTS_WIDTH floats per line, with NaN for unknown values.
+class LogColumns(object):
+    NUTRIENTS_WIDTH = len(NutritionalValue._fields)
+
+    def __init__(self):
+        self.names = []
+        self.ingredients = []
+        self.units = []
+        self.ingredient_ids = array.array(str('l'))
+        self.amounts = array.array(str('d'))
+        self.unit_ids = array.array(str('l'))
+        self.nutrients = array.array(str('d'))
+        self.incomplete = array.array(str('b'))
+        self._ingredient_ids = {}
+        self._unit_ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _ingredient_id(self, ingredient):
+        try:
+            return self._ingredient_ids[ingredient.name]
+        except KeyError:
+            self.ingredients.append(ingredient)
+            return self._ingredient_ids.setdefault(ingredient.name,
+                                                   len(self.ingredients) - 1)
+
+    def _unit_id(self, unit):
+        try:
+            return self._unit_ids[unit]
+        except KeyError:
+            self.units.append(unit)
+            return self._unit_ids.setdefault(unit, len(self.units) - 1)
+
+    def append(self, log_data):
+        log_line = log_data.log_line
+        if log_line and log_line.ingredient:
+            ingredient_id = self._ingredient_id(log_line.ingredient)
+            amount = log_line.amount
+            unit_id = self._unit_id(log_line.unit)
+        else:
+            ingredient_id, amount, unit_id = -1, _NAN, -1
+
+        self.names.append(log_data.name)
+        self.ingredient_ids.append(ingredient_id)
+        self.amounts.append(amount)
+        self.unit_ids.append(unit_id)
+        self.nutrients.extend(log_data.nutritional_value.as_row())
+        self.incomplete.append(bool(log_data.incomplete))
+
+    def nutrient_row(self, row):
+        start = row * self.NUTRIENTS_WIDTH
+        return NutritionalValue.from_row(
+            self.nutrients[start:start + self.NUTRIENTS_WIDTH])
+
+    def leaf(self, row):
+        # The LogData of a row without an ingredient. Rows with one only
+        # keep what Aggregation needs.
+        return LogData(name=self.names[row],
+                       nutritional_value=self.nutrient_row(row),
+                       incomplete=bool(self.incomplete[row]),
+                       is_leaf=True)
+
+    def total(self):
+        # Same sum and unknown fields as LogData.from_parts over the rows
+        return NutritionalValue.sum_rows(self.nutrients, 0, len(self))
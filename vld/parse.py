@@ -5,8 +5,9 @@ from __future__ import absolute_import, unicode_literals, division
 import logging
 import re
 
-from vld.objects import LogLine, LogData, NutritionalValue
+from vld.objects import LogLine, LogData, LogColumns, NutritionalValue
 from vld.conversions import CantConvert
+from vld.utils import LRUCache
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -19,13 +20,37 @@ RE_INGREDIENT_COMMA_QUANTITY = r'^{ingredient_re},\s*{quantity_re}$'
 RE_QUANTITY_OF_INGREDIENT = r'^{quantity_re}\s+(de |of )?{ingredient_re}$'
 
 RE_INGREDIENT = r'(?P<ingredient>.+)'
-RE_QUANTITY = r'(?P<amount>[\d.]+(?:\s*/\s*[\d.]+)?)\s*(?P<unit>{units_re})s?'
+RE_AMOUNT = r'(?:\d+\s+(?=[\d.]+\s*/))?[\d.]+(?:\s*/\s*[\d.]+)?'
+RE_QUANTITY = r'(?P<amount>' + RE_AMOUNT + r')\s*(?P<unit>{units_re})s?'
 
 
-def parse_log_line(line, valid_units=None, empty_unit=None):
-    line = line.strip()
-    logger.debug('Parsing log line: "%s"', line)
-    for regexp in [RE_INGREDIENT_COMMA_QUANTITY, RE_QUANTITY_OF_INGREDIENT]:
+def parse_amount(amount):
+    try:
+        if '/' not in amount:
+            return float(amount)
+        numerator, denominator = amount.split('/')
+        whole, _sep, numerator = numerator.strip().rpartition(' ')
+        value = float(numerator) / float(denominator)
+        if whole:
+            value += int(whole)
+        return value
+    except (ValueError, ZeroDivisionError):
+        raise ParseError('"{}" is not a valid amount.'.format(amount))
+
+
+class LogLineParser(object):
+    _ALTERNATIVES = [RE_INGREDIENT_COMMA_QUANTITY, RE_QUANTITY_OF_INGREDIENT]
+    _GROUPS = [('ingredient{}'.format(i), 'amount{}'.format(i),
+                'unit{}'.format(i)) for i in range(len(_ALTERNATIVES))]
+
+    def __init__(self, valid_units=None, empty_unit=None):
+        self.valid_units = valid_units
+        self.empty_unit = empty_unit
+        self._regexp = re.compile(self._build_pattern(valid_units,
+                                                      empty_unit))
+
+    @classmethod
+    def _build_pattern(cls, valid_units, empty_unit):
         if valid_units:
             # Reverse sorting so "(a|ab)" matches the full "ab"
             ored_units = "|".join(sorted(valid_units, reverse=True))
@@ -38,26 +63,64 @@ def parse_log_line(line, valid_units=None, empty_unit=None):
                 units_re = "(?:|{})".format(units_re)
 
         quantity_re = RE_QUANTITY.format(units_re=units_re)
-        logline_re = regexp.format(ingredient_re=RE_INGREDIENT,
-                                   quantity_re=quantity_re)
-
-        logger.debug('Triying to match "%s" to :"%s"', logline_re, line)
-        matchobj = re.match(logline_re, line)
-        if matchobj:
-            ingredient = matchobj.group("ingredient")
-            amount = matchobj.group("amount")
-            unit = matchobj.group("unit") or empty_unit
-
-            try:
-                # TODO(irossi): FIXME(irossi): ermahgerd, using eval!
-                amount = float(eval(amount))
-            except (ValueError, TypeError, SyntaxError):
-                raise ParseError('"{}" is not a valid amount.'.format(amount))
-
-            return LogLine(name=ingredient, amount=amount, unit=unit)
-        else:
-            logger.debug('"%s" did not match "%s"', logline_re, line)
-    raise ParseError('"{}" is not a valid log line.'.format(line))
+        # Every alternative gets its own group names, so both forms fit in a
+        # single regexp and each line costs only one match.
+        return "|".join(
+            _suffix_groups(regexp.format(ingredient_re=RE_INGREDIENT,
+                                         quantity_re=quantity_re), index)
+            for index, regexp in enumerate(cls._ALTERNATIVES))
+
+    def parse(self, line):
+        line = line.strip()
+        matchobj = self._regexp.match(line)
+        if not matchobj:
+            logger.debug('"%s" did not match "%s"', self._regexp.pattern,
+                         line)
+            raise ParseError('"{}" is not a valid log line.'.format(line))
+
+        for groups in self._GROUPS:
+            ingredient, amount, unit = matchobj.group(*groups)
+            if amount is not None:
+                break
+        # _make skips the keyword handling of the namedtuple defaults,
+        # which costs more than the match itself
+        return LogLine._make((ingredient, parse_amount(amount),
+                              unit or self.empty_unit, None))
+
+
+def _suffix_groups(pattern, suffix):
+    return re.sub(r'\(\?P<(\w+)>', r'(?P<\g<1>{}>'.format(suffix), pattern)
+
+
+_PARSERS = LRUCache(maxsize=1024)
+_PARSERS_BY_ARGS = {}
+_MAX_PARSERS_BY_ARGS = 1024
+
+
+def get_log_line_parser(valid_units=None, empty_unit=None):
+    # Parsers are first looked up by the arguments as given, so the units
+    # are only sorted the first time they are seen. Unhashable units, like
+    # lists, are looked up as a frozenset.
+    key = (valid_units, empty_unit)
+    try:
+        hash(key)
+    except TypeError:
+        key = (frozenset(valid_units), empty_unit)
+    try:
+        return _PARSERS_BY_ARGS[key]
+    except KeyError:
+        pass
+    units_key = tuple(sorted(valid_units)) if valid_units else None
+    parser = _PARSERS.get((units_key, empty_unit),
+                          lambda: LogLineParser(units_key, empty_unit))
+    if len(_PARSERS_BY_ARGS) >= _MAX_PARSERS_BY_ARGS:
+        _PARSERS_BY_ARGS.clear()
+    _PARSERS_BY_ARGS[key] = parser
+    return parser
+
+
+def parse_log_line(line, valid_units=None, empty_unit=None):
+    return get_log_line_parser(valid_units, empty_unit).parse(line)
 
 
 def _parse_log_line(line):
@@ -78,7 +141,164 @@ def _parse_log_line(line):
     return LogLine(name=name, amount=amount, unit=unit)
 
 
+class LogLineRecognizer(object):
+    _AMOUNT = re.compile(RE_AMOUNT)
+    _CONNECTORS = ('de ', 'of ')
+    _END = ''
+
+    def __init__(self, ingredients):
+        self.ingredients = ingredients
+        self._units = {}
+        for unit in ingredients.units():
+            self._add_unit(unit)
+
+    def _add_unit(self, unit):
+        node = self._units
+        for char in unit:
+            node = node.setdefault(char, {})
+        node[self._END] = unit
+
+    def recognize(self, line):
+        line = line.strip()
+        comma = line.rfind(',')
+        if comma != -1:
+            recognized = self._recognize_comma_form(line, comma)
+            if recognized:
+                return recognized
+        return self._recognize_quantity_form(line)
+
+    def _ingredient(self, name):
+        try:
+            return self.ingredients[name]
+        except KeyError:
+            return None
+
+    @staticmethod
+    def _skip_spaces(line, pos):
+        while pos < len(line) and line[pos].isspace():
+            pos += 1
+        return pos
+
+    def _amount(self, line, pos):
+        matchobj = self._AMOUNT.match(line, self._skip_spaces(line, pos))
+        if not matchobj:
+            return None, pos
+        return (parse_amount(matchobj.group()),
+                self._skip_spaces(line, matchobj.end()))
+
+    def _recognize_comma_form(self, line, comma):
+        name = line[:comma]
+        ingredient = self._ingredient(name)
+        if ingredient is None:
+            return None
+        amount, pos = self._amount(line, comma + 1)
+        if amount is None:
+            return None
+        unit = line[pos:]
+        if unit.endswith('s') and ingredient.has_unit(unit[:-1]):
+            unit = unit[:-1]
+        elif not ingredient.has_unit(unit):
+            return None
+        return LogLine(name=name, amount=amount, unit=unit,
+                       ingredient=ingredient)
+
+    def _recognize_quantity_form(self, line):
+        amount, start = self._amount(line, 0)
+        if amount is None:
+            return None
+        # Walks the unit trie once; every unit found along the way is tried
+        # against the rest of the line with constant-time name lookups.
+        node = self._units
+        for pos in range(start, len(line) + 1):
+            unit = node.get(self._END)
+            if unit is not None:
+                recognized = self._recognize_name(line, pos, amount, unit)
+                if recognized:
+                    return recognized
+            if pos == len(line):
+                break
+            node = node.get(line[pos])
+            if node is None:
+                break
+        return None
+
+    def _recognize_name(self, line, pos, amount, unit):
+        if line.startswith('s', pos):
+            pos += 1
+        rest = line[pos:]
+        name = rest.lstrip()
+        if not name or len(name) == len(rest):
+            return None
+        names = [name[len(c):] for c in self._CONNECTORS
+                 if name.startswith(c)] + [name]
+        for name in names:
+            ingredient = self._ingredient(name)
+            if ingredient is not None and ingredient.has_unit(unit):
+                return LogLine(name=name, amount=amount, unit=unit,
+                               ingredient=ingredient)
+        return None
+
+
+_RECOGNIZERS = LRUCache(maxsize=8)
+
+
+def get_log_line_recognizer(ingredients):
+    return _RECOGNIZERS.get(ingredients.version,
+                            lambda: LogLineRecognizer(ingredients))
+
+
+_LOG_DATAS = LRUCache(maxsize=65536)
+
+
 def parse_log_data(line, ingredients):
+    line = line.strip()
+    result = _LOG_DATAS.get(
+        (line, ingredients.version),
+        lambda: _parse_log_data_or_error(line, ingredients))
+    if isinstance(result, ParseError):
+        raise ParseError(*result.args)
+    return result
+
+
+def parse_log_lines(lines, ingredients):
+    # Parses many lines into LogColumns, skipping empty and comment lines.
+    # Lines that can't be parsed are kept as incomplete rows.
+    columns = LogColumns()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            log_data = parse_log_data(line, ingredients)
+        except ParseError as err:
+            logger.info("%s", err)
+            log_data = LogData(name=line.split("#", 1)[0].strip(),
+                               nutritional_value=NutritionalValue.UNKNOWN,
+                               incomplete=True)
+        columns.append(log_data)
+    return columns
+
+
+def _suggestions(name, ingredients):
+    suggestions = ingredients.suggest(name)
+    if not suggestions:
+        return ''
+    return ' (did you mean {}?)'.format(', '.join('"{}"'.format(s)
+                                                  for s in suggestions))
+
+
+def parse_log_data_stats():
+    return _LOG_DATAS.stats()
+
+
+def _parse_log_data_or_error(line, ingredients):
+    try:
+        return _parse_log_data_with_comment(line, ingredients)
+    except ParseError as err:
+        return err
+
+
+def _parse_log_data_with_comment(line, ingredients):
     try:
         line, comment = line.split('#', 1)
     except ValueError:
@@ -93,11 +313,17 @@ def parse_log_data(line, ingredients):
 
 
 def _parse_log_data(line, ingredients):
-    parsed = parse_log_line(line)
-    try:
-        ingredient = ingredients[parsed.name]
-    except KeyError:
-        raise ParseError('Invalid ingredient: "{}"'.format(parsed.name))
+    parsed = get_log_line_recognizer(ingredients).recognize(line)
+    if parsed:
+        ingredient = parsed.ingredient
+    else:
+        # Not recognized: the generic parser tells what was wrong
+        parsed = get_log_line_parser().parse(line)
+        try:
+            ingredient = ingredients[parsed.name]
+        except KeyError:
+            raise ParseError('Invalid ingredient: "{}"{}'.format(
+                parsed.name, _suggestions(parsed.name, ingredients)))
     try:
         nut_value = ingredient.get_nutritional_value(parsed.amount,
                                                      parsed.unit)
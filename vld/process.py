@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+import multiprocessing
+import os
+
+from .logs import walk_log, walk_log_files
+from .objects import LogColumns, LogData, NutritionalValue
+from .parse import parse_log_data, parse_log_lines, ParseError
+from .tree import build_log
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def process_log(name, records, ingredients, compact=False, max_depth=None):
+    # `records` are (components, line) pairs, as yielded by walk_log
+    return build_log(name, (
+        (components, make_leaf(line, ingredients)
+         if line is not None and _is_log_line(line) else None)
+        for components, line in records),
+                     compact=compact,
+                     max_depth=max_depth)
+
+
+def _is_log_line(line):
+    line = line.strip()
+    return line and not line.startswith('#')
+
+
+def make_leaf(line, ingredients):
+    return make_log_data(line, ingredients)._replace(is_leaf=True)
+
+
+def process_path(path, ingredients, compact=False, max_depth=None):
+    return process_log(os.path.basename(path.rstrip('/')), walk_log(path),
+                       ingredients,
+                       compact=compact,
+                       max_depth=max_depth)
+
+
+def process_paths(paths, ingredients,
+                  jobs=1,
+                  cache=None,
+                  compact=False,
+                  max_depth=None,
+                  walk=walk_log_files):
+    # `walk` lists the files of a path, like walk_log_files
+    if jobs == 1 and cache is None and walk is walk_log_files:
+        return [process_path(p, ingredients,
+                             compact=compact,
+                             max_depth=max_depth) for p in paths]
+    pool, processes = _make_pool(ingredients, jobs)
+    try:
+        return [build_log(os.path.basename(p.rstrip('/')),
+                          _file_records(walk(p), ingredients, pool,
+                                        processes, cache),
+                          compact=compact,
+                          max_depth=max_depth)
+                for p in paths]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def process_paths_columns(paths, ingredients,
+                          jobs=1,
+                          cache=None,
+                          walk=walk_log_files):
+    # Same leaves as process_paths, as a single LogColumns for all `paths`,
+    # for reports that only aggregate the leaves and don't need the tree
+    if jobs == 1 and cache is None and walk is walk_log_files:
+        return parse_log_lines((line for p in paths
+                                for _c, line in walk_log(p)
+                                if line is not None), ingredients)
+    pool, processes = _make_pool(ingredients, jobs)
+    try:
+        columns = LogColumns()
+        for path in paths:
+            for _components, leaf in _file_records(walk(path), ingredients,
+                                                   pool, processes, cache):
+                if leaf is not None:
+                    columns.append(leaf)
+        return columns
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def _make_pool(ingredients, jobs):
+    # Returns the pool to parse files in, or None to parse them here, and
+    # the number of processes
+    if jobs == 1:
+        return None, 1
+    processes = jobs or multiprocessing.cpu_count()
+    return multiprocessing.Pool(processes,
+                                initializer=_init_worker,
+                                initargs=(ingredients, )), processes
+
+
+def update_log_tree(tree, watcher, ingredients, cache=None):
+    # Applies the changes since the last poll of `watcher` to `tree`, and
+    # returns whether the tree changed
+    changed, removed = watcher.poll()
+    updated = bool(removed)
+    for components in removed:
+        if components in tree:  # Might have gone with its parent
+            tree.remove(components)
+
+    filenames = [f for _c, f in changed if f is not None]
+    leaves = _parse_log_files(filenames, ingredients, None, 1, cache)
+    for components, filename in changed:
+        if filename is None:
+            node_leaves = []
+        else:
+            node_leaves = [_attach_ingredient(l, ingredients)
+                           for l in next(leaves)]
+        updated |= tree.set_leaves(components, node_leaves)
+    return updated
+
+
+def _file_records(files, ingredients, pool, processes, cache):
+    # Same records as process_log gets for the (components, filename)
+    # records in `files`, but parsing whole files, maybe from `cache` or in
+    # `pool`
+    files = list(files)
+    filenames = [f for _c, f in files if f is not None]
+    leaves = _parse_log_files(filenames, ingredients, pool, processes, cache)
+    for components, filename in files:
+        if filename is None:
+            yield components, None
+            continue
+        for leaf in next(leaves):
+            yield components, _attach_ingredient(leaf, ingredients)
+
+
+def _parse_log_files(filenames, ingredients, pool, processes, cache):
+    if cache is None:
+        missing = filenames
+    else:
+        missing = [f for f in filenames if not cache.fresh(f)]
+    if pool is None:
+        parsed = (_parse_log_file(f, ingredients) for f in missing)
+    else:
+        # imap keeps the order of `missing`, so leaves come back in the same
+        # order a sequential walk would parse them
+        chunksize = max(1, len(missing) // (processes * 4))
+        parsed = pool.imap(_process_log_file, missing, chunksize)
+
+    missing = set(missing)
+    for filename in filenames:
+        if filename in missing:
+            leaves = next(parsed)
+            if cache is not None:
+                cache.put(filename, leaves)
+        else:
+            leaves = cache.get(filename)
+        yield leaves
+
+
+def _parse_log_file(filename, ingredients):
+    with open(filename) as fin:
+        return [_detach_ingredient(make_leaf(l, ingredients))
+                for l in fin if _is_log_line(l)]
+
+
+_WORKER_INGREDIENTS = [None]
+
+
+def _init_worker(ingredients):
+    _WORKER_INGREDIENTS[0] = ingredients
+
+
+def _process_log_file(filename):
+    return _parse_log_file(filename, _WORKER_INGREDIENTS[0])
+
+
+# Leaves travel between processes and into the cache with ingredient names
+# instead of whole ingredients, which would be pickled once per file
+def _detach_ingredient(leaf):
+    if leaf.log_line and leaf.log_line.ingredient:
+        return leaf._replace(log_line=leaf.log_line._replace(
+            ingredient=leaf.log_line.ingredient.name))
+    return leaf
+
+
+def _attach_ingredient(leaf, ingredients):
+    if leaf.log_line and leaf.log_line.ingredient:
+        return leaf._replace(log_line=leaf.log_line._replace(
+            ingredient=ingredients[leaf.log_line.ingredient]))
+    return leaf
+
+
+def make_log_data(line, ingredients):
+    try:
+        return parse_log_data(line, ingredients)
+    except ParseError as err:
+        logger.info("%s", err)
+        return LogData(name=line.split("#", 1)[0].strip(),
+                       nutritional_value=NutritionalValue.UNKNOWN,
+                       incomplete=True)
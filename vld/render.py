@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, division
+
+import logging
+import sys
+
+from pignacio_scripts.terminal.color import (bright_blue, bright_cyan,
+                                             bright_green, bright_magenta,
+                                             bright_red, red)
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+_DEFAULT_FORMAT = (
+    '%(calories)s kCal (%(net_carbs)4s nc, %(protein)4s p, %(fat)4s f) '
+    '[%(fiber)4s df]')
+
+_DEFAULT_COLORS = [bright_green, bright_blue, bright_magenta, bright_cyan, red]
+
+
+def _log_values(nut_value):
+    values = dict(zip(nut_value._fields, nut_value))
+    values['net_carbs'] = nut_value.net_carbs
+    return {f: "???" if v is None else "%.1f" % v for f, v in values.items()}
+
+
+_RENDER_CHUNK_SIZE = 1 << 16
+
+
+# pylint: disable=too-many-arguments,redefined-builtin
+def print_log(log,
+              format=_DEFAULT_FORMAT,
+              level=0,
+              width=100,
+              colors=None,
+              max_levels=None,
+              out=None,
+              color=None):
+    # Renders into a buffer that is written in large chunks. Colors are
+    # only used when `out` is a terminal, unless `color` says otherwise.
+    out = out or sys.stdout
+    if color is None:
+        color = out.isatty()
+    buf = []
+    size = 0
+    for line in render_log(log, format, level, width, colors, max_levels,
+                           color):
+        buf.append(line)
+        size += len(line)
+        if size >= _RENDER_CHUNK_SIZE:
+            out.write(''.join(buf))
+            buf = []
+            size = 0
+    out.write(''.join(buf))
+
+
+def render_log(log,
+               format=_DEFAULT_FORMAT,
+               level=0,
+               width=100,
+               colors=None,
+               max_levels=None,
+               color=True):
+    # Yields the lines of the report for `log`, walking it with an explicit
+    # stack. None entries in the stack stand for the blank line closing the
+    # parts of a node.
+    if color:
+        colors = colors or _DEFAULT_COLORS
+        incomplete_marker = bright_red("!")
+        unknown_marker = bright_red("*")
+    else:
+        colors = ()
+        incomplete_marker = "!"
+        unknown_marker = "*"
+
+    stack = [(log, level)]
+    while stack:
+        entry = stack.pop()
+        if entry is None:
+            yield '\n'
+            continue
+        log, level = entry
+        right_part = format % _log_values(log.nutritional_value)
+        left_part = ' ' * level + log.name + ':'
+        line = left_part + right_part.rjust(width - len(left_part) - 2)
+        if level < len(colors):
+            line = colors[level](line)
+        yield ''.join((line, unknown_marker if "???" in right_part else " ",
+                       incomplete_marker if log.incomplete else " ", '\n'))
+
+        if log.parts and (max_levels is None or level < max_levels):
+            stack.append(None)
+            stack.extend((p, level + 1) for p in reversed(log.parts))
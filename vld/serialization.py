@@ -2,36 +2,206 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals, division
 
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
+import sys
 
+from .ingredient import LazyIngredientMap, normalize_name
 from .objects import Ingredient
+from .utils import LRUCache
+
+try:
+    import cPickle as pickle
+except ImportError:  # Python 3
+    import pickle
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+_CACHE_VERSION = 2
+
 
-def load_ingredients(directory):
+def load_ingredients(directory, use_cache=True, cache_path=None,
+                     processes=1):
     if not os.path.isdir(directory):
         raise ValueError(
             "Invalid ingredient directory: '{}'".format(directory))
     logger.info("Loading ingredients from '%s'", directory)
-    ingredients = []
-    for path, _subdirs, filenames in os.walk(directory):
-        for filename in filenames:
-            fullpath = os.path.join(path, filename)
-            logging.debug(" - Parsing ingredients from '%s'", fullpath)
-            with open(fullpath) as fin:
-                try:
-                    parsed = json.load(fin)
-                except Exception:
-                    logger.exception("Could not parse JSON from '%s'",
-                                     fullpath)
-                    continue
-
-            if not isinstance(parsed, list):
-                parsed = [parsed]
-            ingredients.extend([Ingredient.from_json(data) for data in parsed])
+    filenames = _ingredient_files(directory)
+
+    if use_cache:
+        cache_path = cache_path or get_cache_path(directory)
+        signature = _files_signature(filenames)
+        ingredients = _read_cache(cache_path, signature)
+        if ingredients is None:
+            ingredients = _load_files(filenames, processes)
+            _write_cache(cache_path, signature, ingredients)
+    else:
+        ingredients = _load_files(filenames, processes)
 
     logger.info("Loaded %d ingredients", len(ingredients))
     return ingredients
+
+
+def get_fingerprint(directory):
+    # Changes whenever any ingredient file does
+    signature = _files_signature(_ingredient_files(directory))
+    return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()
+
+
+def get_cache_path(directory):
+    return directory.rstrip('/') + '.cache'
+
+
+def load_ingredient_map(directory, index_path=None, processes=1):
+    if not os.path.isdir(directory):
+        raise ValueError(
+            "Invalid ingredient directory: '{}'".format(directory))
+    logger.info("Loading ingredient index for '%s'", directory)
+    index_path = index_path or get_index_path(directory)
+    filenames = _ingredient_files(directory)
+    signature = [list(s) for s in _files_signature(filenames)]
+
+    _INDEXED_FILES.clear()
+    index = _read_index(index_path, signature)
+    if index is None:
+        index = _build_index(filenames, processes)
+        _write_index(index_path, signature, index)
+
+    logger.info("Indexed %d ingredients", len(index['names']))
+    return LazyIngredientMap(index['names'], _load_indexed, index['units'],
+                             index['aliases'])
+
+
+def get_index_path(directory):
+    return directory.rstrip('/') + '.index'
+
+
+def _build_index(filenames, processes=1):
+    names = {}
+    aliases = {}
+    units = set()
+    for fullpath, ingredients in zip(filenames,
+                                     _parse_files(filenames, processes)):
+        for position, ingredient in enumerate(ingredients):
+            key = normalize_name(ingredient.name)
+            names[key] = [fullpath, position]
+            aliases.update((normalize_name(a), key)
+                           for a in ingredient.aliases)
+            units.update(ingredient.units())
+    return {'names': names, 'aliases': aliases, 'units': sorted(units)}
+
+
+def _read_index(index_path, signature):
+    try:
+        with open(index_path) as fin:
+            stored = json.load(fin)
+    except (IOError, OSError, ValueError):
+        logger.debug("Could not read ingredient index '%s'", index_path,
+                     exc_info=True)
+        return None
+    if stored.get('signature') != signature:
+        logger.info("Ingredient index '%s' is stale", index_path)
+        return None
+    return stored['index']
+
+
+def _write_index(index_path, signature, index):
+    tmp_path = '{}.{}.tmp'.format(index_path, os.getpid())
+    try:
+        with open(tmp_path, 'w') as fout:
+            json.dump({'signature': signature, 'index': index}, fout)
+        os.rename(tmp_path, index_path)
+    except (IOError, OSError):
+        logger.warning("Could not write ingredient index '%s'", index_path,
+                       exc_info=True)
+
+
+# Files holding several ingredients are parsed once for all of them
+_INDEXED_FILES = LRUCache(maxsize=16)
+
+
+def _load_indexed(location):
+    fullpath, position = location
+    return _INDEXED_FILES.get(fullpath, lambda: _load_file(fullpath))[position]
+
+
+def _ingredient_files(directory):
+    filenames = []
+    for path, subdirs, files in os.walk(directory):
+        subdirs.sort()
+        filenames.extend(os.path.join(path, f) for f in sorted(files))
+    return filenames
+
+
+def _load_files(filenames, processes=1):
+    ingredients = []
+    for parsed in _parse_files(filenames, processes):
+        ingredients.extend(parsed)
+    return ingredients
+
+
+def _parse_files(filenames, processes=1):
+    # Returns the ingredients of each file, in the same order as `filenames`.
+    # `processes=None` uses one process per CPU.
+    if processes == 1 or len(filenames) < 2:
+        return [_load_file(f) for f in filenames]
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        chunksize = max(1, len(filenames) // (processes * 4))
+        return pool.map(_load_file, filenames, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _load_file(fullpath):
+    logging.debug(" - Parsing ingredients from '%s'", fullpath)
+    with open(fullpath) as fin:
+        try:
+            parsed = json.load(fin)
+        except Exception:
+            logger.exception("Could not parse JSON from '%s'", fullpath)
+            return []
+
+    if not isinstance(parsed, list):
+        parsed = [parsed]
+    return [Ingredient.from_json(data) for data in parsed]
+
+
+def _files_signature(filenames):
+    signature = [(_CACHE_VERSION, sys.version_info[0])]
+    for filename in filenames:
+        stat = os.stat(filename)
+        signature.append((filename, stat.st_mtime, stat.st_size))
+    return signature
+
+
+def _read_cache(cache_path, signature):
+    try:
+        with open(cache_path, 'rb') as fin:
+            cached_signature, ingredients = pickle.load(fin)
+    except Exception:  # pylint: disable=broad-except
+        logger.debug("Could not read ingredient cache '%s'", cache_path,
+                     exc_info=True)
+        return None
+    if cached_signature != signature:
+        logger.info("Ingredient cache '%s' is stale", cache_path)
+        return None
+    logger.debug("Using ingredient cache '%s'", cache_path)
+    return ingredients
+
+
+def _write_cache(cache_path, signature, ingredients):
+    tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as fout:
+            pickle.dump((signature, ingredients), fout,
+                        pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError, pickle.PicklingError):
+        logger.warning("Could not write ingredient cache '%s'", cache_path,
+                       exc_info=True)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, division
+
+import bisect
+import collections
+import heapq
+import logging
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def _ngrams(name, size=2):
+    padded = ' {} '.format(name)
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+class NameIndex(object):
+    def __init__(self, names):
+        self._names = sorted(set(names))
+        self._sizes = []
+        self._postings = collections.defaultdict(list)
+        for position, name in enumerate(self._names):
+            ngrams = _ngrams(name)
+            self._sizes.append(len(ngrams))
+            for ngram in ngrams:
+                self._postings[ngram].append(position)
+
+    def __len__(self):
+        return len(self._names)
+
+    def with_prefix(self, prefix, limit=None):
+        # Names are sorted, so the ones with the prefix are contiguous
+        start = bisect.bisect_left(self._names, prefix)
+        res = []
+        for name in self._names[start:]:
+            if not name.startswith(prefix) or len(res) == limit:
+                break
+            res.append(name)
+        return res
+
+    def closest(self, name, limit=3, min_score=0.3):
+        # Ranks names by the Dice coefficient of their ngram sets. Only names
+        # sharing at least one ngram are ever looked at.
+        ngrams = _ngrams(name)
+        shared = collections.Counter()
+        for ngram in ngrams:
+            shared.update(self._postings.get(ngram, ()))
+        scored = (
+            (-2 * count / (len(ngrams) + self._sizes[position]),
+             self._names[position])
+            for position, count in shared.items()
+        )
+        best = heapq.nsmallest(limit,
+                               (s for s in scored if -s[0] >= min_score))
+        return [n for _score, n in best]
@@ -0,0 +1,449 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals, division
+
+import array
+import hashlib
+import logging
+
+from .objects import LogData, LogLine, NutritionalValue
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+_HASH_MOD = 2**64
+_WIDTH = len(NutritionalValue._fields)
+
+
+def _digest(value):
+    digest = hashlib.sha1(repr(value).encode('utf-8')).hexdigest()
+    return int(digest[:16], 16)
+
+
+def _leaves_hash(name, leaves):
+    return _digest((name, tuple((leaf.name, tuple(leaf.nutritional_value),
+                                 leaf.incomplete) for leaf in leaves)))
+
+
+def _leaf_totals(leaves):
+    totals = [0] * _WIDTH
+    for leaf in leaves:
+        for index, value in enumerate(leaf.nutritional_value):
+            if value is not None:
+                totals[index] += value
+    return totals
+
+
+class _Node(object):
+    __slots__ = ('name', 'parent', 'children', 'leaves', 'own_hash',
+                 'leaf_totals', 'leaf_incomplete', 'hash', 'totals',
+                 'incomplete', 'view')
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.children = {}
+        self.leaves = []
+        self.own_hash = _leaves_hash(name, [])
+        self.leaf_totals = [0] * _WIDTH
+        self.leaf_incomplete = 0
+        # Aggregates over the whole subtree
+        self.hash = self.own_hash
+        self.totals = [0] * _WIDTH
+        self.incomplete = 0
+        self.view = None
+
+
+class LogTree(object):
+    # A log tree that keeps, in every node, the nutritional totals, the
+    # number of incomplete leaves and a content hash of its subtree.
+    #
+    # Subtree hashes add up their children's hashes (modulo 2**64), so like
+    # the totals they change by the same delta as the node that changed.
+    # Replacing the leaves of a node only updates the path to the root.
+    def __init__(self, name):
+        self.root = _Node(name, None)
+
+    @classmethod
+    def from_records(cls, name, records):
+        # `records` are (components, leaf) pairs, as build_log takes them
+        tree = cls(name)
+        leaves = {}
+        for components, leaf in records:
+            node_leaves = leaves.setdefault(components, [])
+            if leaf is not None:
+                node_leaves.append(leaf)
+        for components, node_leaves in leaves.items():
+            tree.set_leaves(components, node_leaves)
+        return tree
+
+    @property
+    def hash(self):
+        return self.root.hash
+
+    def _propagate(self, node, totals, incomplete, hash_delta):
+        while node is not None:
+            for index, value in enumerate(totals):
+                node.totals[index] += value
+            node.incomplete += incomplete
+            node.hash = (node.hash + hash_delta) % _HASH_MOD
+            node.view = None
+            node = node.parent
+
+    def _get_node(self, components, create=False):
+        node = self.root
+        for name in components:
+            try:
+                node = node.children[name]
+            except KeyError:
+                if not create:
+                    raise
+                child = _Node(name, node)
+                node.children[name] = child
+                self._propagate(node, [0] * _WIDTH, 0, child.hash)
+                node = child
+        return node
+
+    def __contains__(self, components):
+        try:
+            self._get_node(components)
+        except KeyError:
+            return False
+        return True
+
+    def set_leaves(self, components, leaves):
+        # Returns whether anything changed, creating the node counts
+        created = components not in self
+        node = self._get_node(components, create=True)
+        leaves = list(leaves)
+        own_hash = _leaves_hash(node.name, leaves)
+        if own_hash == node.own_hash:
+            return created
+
+        leaf_totals = _leaf_totals(leaves)
+        leaf_incomplete = sum(1 for leaf in leaves if leaf.incomplete)
+        self._propagate(node,
+                        [n - o for n, o in zip(leaf_totals, node.leaf_totals)],
+                        leaf_incomplete - node.leaf_incomplete,
+                        own_hash - node.own_hash)
+        node.leaves = leaves
+        node.own_hash = own_hash
+        node.leaf_totals = leaf_totals
+        node.leaf_incomplete = leaf_incomplete
+        return True
+
+    def remove(self, components):
+        node = self._get_node(components)
+        if node.parent is None:
+            raise ValueError("Cannot remove the root node")
+        del node.parent.children[node.name]
+        self._propagate(node.parent, [-v for v in node.totals],
+                        -node.incomplete, -node.hash)
+
+    def totals(self, components=()):
+        return NutritionalValue(*self._get_node(components).totals)
+
+    def log_data(self, components=()):
+        # LogData views are cached per node until something below changes.
+        # They are summed from their parts like build_log does, so they do
+        # not carry the rounding errors of the running totals.
+        return self._view(self._get_node(components))
+
+    def _view(self, node):
+        if node.view is None:
+            parts = [self._view(node.children[name])
+                     for name in sorted(node.children)]
+            parts.extend(node.leaves)
+            node.view = LogData.from_parts(node.name, parts)
+        return node.view
+
+
+_ZEROS = [0.] * len(NutritionalValue._fields)
+
+
+def _set_bit(bits, index):
+    bits[index >> 3] |= 1 << (index & 7)
+
+
+def _get_bit(bits, index):
+    return bool(bits[index >> 3] & (1 << (index & 7)))
+
+
+class CompactLogTree(object):
+    # A whole log tree in a handful of flat arrays. Nodes are numbered in
+    # preorder: parents[i] is the parent of node i (-1 for the root) and
+    # ends[i] is one past the last node of its subtree, so the children of
+    # i are i + 1, ends[i + 1], ... up to ends[i].
+    #
+    # Nutrients are a row-major matrix, WIDTH floats per node, with NaN for
+    # unknown values. Names, units and ingredients are interned, and the
+    # incomplete and is_leaf flags are bitmasks. Leaves keep their log line
+    # in the line_* columns, where line_names is -1 if they have none.
+    WIDTH = len(NutritionalValue._fields)
+
+    def __init__(self):
+        self.strings = []
+        self.ingredients = []
+        self.names = array.array(str('i'))
+        self.parents = array.array(str('i'))
+        self.ends = array.array(str('i'))
+        self.nutrients = array.array(str('d'))
+        self.incomplete = bytearray()
+        self.leaves = bytearray()
+        self.line_names = array.array(str('i'))
+        self.line_ingredients = array.array(str('i'))
+        self.line_amounts = array.array(str('d'))
+        self.line_units = array.array(str('i'))
+        self._string_ids = {}
+        self._ingredient_ids = {}
+
+    @classmethod
+    def from_records(cls, name, records):
+        # Same records and tree as build_log. Open nodes are kept in a stack
+        # of (components, index, sums), and their sums are written to the
+        # matrix and added to their parent's when they are closed.
+        tree = cls()
+        width = cls.WIDTH
+        stack = [((), tree._open(name, -1), [0] * width)]
+
+        def close_node():
+            _components, index, sums = stack.pop()
+            tree._close(index, sums, stack[-1] if stack else None)
+
+        for components, leaf in records:
+            while components[:len(stack[-1][0])] != stack[-1][0]:
+                close_node()
+            while len(stack[-1][0]) < len(components):
+                depth = len(stack[-1][0]) + 1
+                stack.append((components[:depth],
+                              tree._open(components[depth - 1],
+                                         stack[-1][1]), [0] * width))
+            if leaf is not None:
+                tree._add_leaf(leaf, stack[-1][1], stack[-1][2])
+        while stack:
+            close_node()
+        return tree
+
+    def __len__(self):
+        return len(self.names)
+
+    def _intern(self, string):
+        try:
+            return self._string_ids[string]
+        except KeyError:
+            self.strings.append(string)
+            return self._string_ids.setdefault(string, len(self.strings) - 1)
+
+    def _intern_ingredient(self, ingredient):
+        try:
+            return self._ingredient_ids[ingredient.name]
+        except KeyError:
+            self.ingredients.append(ingredient)
+            return self._ingredient_ids.setdefault(ingredient.name,
+                                                   len(self.ingredients) - 1)
+
+    def _append(self, name, parent, row):
+        index = len(self.names)
+        self.names.append(self._intern(name))
+        self.parents.append(parent)
+        self.ends.append(index + 1)
+        self.nutrients.extend(row)
+        if index & 7 == 0:
+            self.incomplete.append(0)
+            self.leaves.append(0)
+        self.line_names.append(-1)
+        self.line_ingredients.append(-1)
+        self.line_amounts.append(0.)
+        self.line_units.append(-1)
+        return index
+
+    def _open(self, name, parent):
+        return self._append(name, parent, _ZEROS)
+
+    def _close(self, index, sums, parent_entry):
+        self.ends[index] = len(self.names)
+        start = index * self.WIDTH
+        self.nutrients[start:start + self.WIDTH] = array.array(str('d'), sums)
+        if parent_entry is None:
+            return
+        _components, parent, parent_sums = parent_entry
+        for field, value in enumerate(sums):
+            parent_sums[field] += value
+        if _get_bit(self.incomplete, index):
+            _set_bit(self.incomplete, parent)
+
+    def _add_leaf(self, leaf, parent, parent_sums):
+        # Leaves are stored without their parts
+        values = leaf.nutritional_value
+        index = self._append(leaf.name, parent, values.as_row())
+        for field, value in enumerate(values):
+            if value is not None:
+                parent_sums[field] += value
+        if leaf.incomplete:
+            _set_bit(self.incomplete, index)
+            _set_bit(self.incomplete, parent)
+        if leaf.is_leaf:
+            _set_bit(self.leaves, index)
+        log_line = leaf.log_line
+        if log_line is not None:
+            self.line_names[index] = self._intern(log_line.name)
+            if log_line.ingredient is not None:
+                self.line_ingredients[index] = self._intern_ingredient(
+                    log_line.ingredient)
+            self.line_amounts[index] = log_line.amount
+            self.line_units[index] = self._intern(log_line.unit)
+
+    def children(self, index):
+        child = index + 1
+        end = self.ends[index]
+        while child < end:
+            yield child
+            child = self.ends[child]
+
+    def nutritional_value(self, index):
+        start = index * self.WIDTH
+        return NutritionalValue.from_row(
+            self.nutrients[start:start + self.WIDTH])
+
+    def unknown_fields(self, index):
+        # Inner nodes hold sums, so only the leaves below can be unknown.
+        # They are the contiguous rows after `index`.
+        return NutritionalValue.sum_rows(self.nutrients, index + 1,
+                                         self.ends[index])[1]
+
+    def log_line(self, index):
+        name = self.line_names[index]
+        if name < 0:
+            return None
+        ingredient_id = self.line_ingredients[index]
+        ingredient = (None if ingredient_id < 0 else
+                      self.ingredients[ingredient_id])
+        return LogLine(name=self.strings[name],
+                       amount=self.line_amounts[index],
+                       unit=self.strings[self.line_units[index]],
+                       ingredient=ingredient)
+
+    def log_data(self, index=0):
+        return CompactLogData(self, index)
+
+
+class CompactLogData(object):
+    # A read-only LogData lookalike for a node of a CompactLogTree. Values
+    # are read from the tree on access, so views are cheap to create.
+    __slots__ = ('tree', 'index')
+
+    ingredient = None
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def name(self):
+        return self.tree.strings[self.tree.names[self.index]]
+
+    @property
+    def nutritional_value(self):
+        return self.tree.nutritional_value(self.index)
+
+    @property
+    def parts(self):
+        return [CompactLogData(self.tree, c)
+                for c in self.tree.children(self.index)]
+
+    @property
+    def log_line(self):
+        return self.tree.log_line(self.index)
+
+    @property
+    def incomplete(self):
+        return _get_bit(self.tree.incomplete, self.index)
+
+    @property
+    def unknown_fields(self):
+        return self.tree.unknown_fields(self.index)
+
+    @property
+    def is_leaf(self):
+        return _get_bit(self.tree.leaves, self.index)
+
+
+def build_log(name, records, compact=False, max_depth=None):
+    # `records` are (components, leaf) pairs in walk_log_files order, where
+    # `leaf` is a parsed LogData or None. Open nodes are kept in a stack of
+    # (components, name, parts) and folded into their parent when closed.
+    # A compact log is a view of a CompactLogTree instead.
+    if max_depth is not None:
+        return build_log_to_depth(name, records, max_depth)
+    if compact:
+        return CompactLogTree.from_records(name, records).log_data()
+    stack = [((), name, [])]
+
+    def close_node():
+        _components, node_name, parts = stack.pop()
+        stack[-1][2].append(LogData.from_parts(node_name, parts))
+
+    for components, leaf in records:
+        while components[:len(stack[-1][0])] != stack[-1][0]:
+            close_node()
+        while len(stack[-1][0]) < len(components):
+            depth = len(stack[-1][0]) + 1
+            stack.append((components[:depth], components[depth - 1], []))
+        if leaf is not None:
+            stack[-1][2].append(leaf)
+
+    while len(stack) > 1:
+        close_node()
+    return LogData.from_parts(name, stack[0][2])
+
+
+def build_log_to_depth(name, records, max_depth):
+    # Same as build_log, but nodes deeper than `max_depth` (the root being
+    # at depth 0) are never built. Open nodes are kept in a stack of
+    # (components, name, parts, sums, status), where `parts` is None for
+    # nodes whose parts are not shown, and whose leaves and children only
+    # add to `sums` and `status`, an [incomplete, unknown fields] pair.
+    width = len(NutritionalValue._fields)
+    stack = [((), name, [] if max_depth > 0 else None, [0] * width,
+              [False, set()])]
+
+    def close_node():
+        _components, node_name, parts, sums, status = stack.pop()
+        fold(_depth_log_data(node_name, parts, sums, status))
+
+    def fold(log_data):
+        _components, _name, parts, sums, status = stack[-1]
+        for index, value in enumerate(log_data.nutritional_value):
+            if value is not None:
+                sums[index] += value
+            else:
+                status[1].add(NutritionalValue._fields[index])
+        status[0] = status[0] or log_data.incomplete
+        status[1].update(log_data.unknown_fields)
+        if parts is not None:
+            parts.append(log_data)
+
+    for components, leaf in records:
+        while components[:len(stack[-1][0])] != stack[-1][0]:
+            close_node()
+        while len(stack[-1][0]) < len(components):
+            depth = len(stack[-1][0]) + 1
+            stack.append((components[:depth], components[depth - 1],
+                          [] if depth < max_depth else None, [0] * width,
+                          [False, set()]))
+        if leaf is not None:
+            fold(leaf)
+
+    while len(stack) > 1:
+        close_node()
+    _components, _name, parts, sums, status = stack[0]
+    return _depth_log_data(name, parts, sums, status)
+
+
+def _depth_log_data(name, parts, sums, status):
+    incomplete, unknown = status
+    return LogData(name=name,
+                   nutritional_value=NutritionalValue(*sums),
+                   parts=parts or [],
+                   incomplete=incomplete,
+                   unknown_fields=tuple(f for f in NutritionalValue._fields
+                                        if f in unknown))
@@ -3,7 +3,10 @@
 from __future__ import absolute_import, unicode_literals, division
 
 import argparse
+import collections
+import datetime
 import logging
+import re
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
@@ -42,3 +45,87 @@ def base_argument_parser():
         action='count',
         help='Enable logging. If set twice, sets level to DEBUG.')
     return parser
+
+
+def add_jobs_argument(parser):
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=1,
+        help='Number of processes to use. 0 uses one per CPU.')
+    return parser
+
+
+def parse_date(string, today=None):
+    # YYYY-MM-DD, 'today', 'yesterday' or 'Nd' for N days ago
+    today = today or datetime.date.today()
+    string = string.strip().lower()
+    if string == 'today':
+        return today
+    if string == 'yesterday':
+        return today - datetime.timedelta(days=1)
+    match = re.match(r'^(\d+)d$', string)
+    if match:
+        return today - datetime.timedelta(days=int(match.group(1)))
+    try:
+        return datetime.datetime.strptime(string, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'Invalid date: "{}". Use YYYY-MM-DD, today, yesterday or Nd '
+            '(N days ago)'.format(string))
+
+
+def add_date_range_arguments(parser):
+    parser.add_argument(
+        '--since',
+        type=parse_date,
+        default=None,
+        help='Only use the logs of this day and after it.')
+    parser.add_argument(
+        '--until',
+        type=parse_date,
+        default=None,
+        help='Only use the logs of this day and before it.')
+    return parser
+
+
+CacheStats = collections.namedtuple('CacheStats',
+                                    ['hits', 'misses', 'size', 'maxsize'])
+
+
+class LRUCache(object):
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, factory):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            value = factory()
+            if len(self._data) >= self.maxsize:
+                self._data.popitem(last=False)
+        else:
+            self.hits += 1
+        self._data[key] = value
+        return value
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return CacheStats(hits=self.hits,
+                          misses=self.misses,
+                          size=len(self._data),
+                          maxsize=self.maxsize)